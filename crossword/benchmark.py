@@ -0,0 +1,231 @@
+import argparse
+import concurrent.futures
+import csv
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+from crossword import Crossword
+from generate import CrosswordCreator, solve_portfolio
+
+METHODS = ["mac", "cbj", "portfolio"]
+
+
+def main():
+
+    # Check for proper usage
+    parser = argparse.ArgumentParser(
+        usage="python benchmark.py [--sizes N ...] [--density FRACTION] "
+              "[--vocabulary N] [options]"
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 7, 9, 11],
+                        help="side lengths of the square grids to generate")
+    parser.add_argument("--density", type=float, default=0.25,
+                        help="fraction of cells to black out")
+    parser.add_argument("--words", default=os.path.join("data", "words2.txt"),
+                        help="word list to sample vocabularies from")
+    parser.add_argument("--vocabulary", type=int, default=2000,
+                        help="number of words to sample for each grid")
+    parser.add_argument("--trials", type=int, default=3)
+    parser.add_argument("--methods", nargs="+", choices=METHODS,
+                        default=METHODS)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="searches to race in the portfolio method")
+    parser.add_argument("--timeout", type=float, default=60,
+                        help="seconds to allow each solver run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", default=None,
+                        help="directory to write the generated puzzles to")
+    args = parser.parse_args()
+
+    writer = csv.writer(sys.stdout)
+    writer.writerow([
+        "size", "density", "trial", "variables", "words", "method",
+        "result", "seconds", "nodes", "revisions", "peak_rss_mb"
+    ])
+
+    with tempfile.TemporaryDirectory() as scratch:
+        directory = args.save or scratch
+        os.makedirs(directory, exist_ok=True)
+
+        # Time every method on puzzles of increasing size
+        for size in args.sizes:
+            for trial in range(args.trials):
+                seed = f"{args.seed}:{size}:{trial}"
+                structure = generate_structure(
+                    size, size, args.density, seed=seed
+                )
+                vocabulary = sample_vocabulary(
+                    args.words, args.vocabulary, seed=seed
+                )
+                name = f"puzzle_{size}_{trial}"
+                structure_file = os.path.join(directory, f"{name}.txt")
+                words_file = os.path.join(directory, f"{name}_words.txt")
+                write_structure(structure, structure_file)
+                write_words(vocabulary, words_file)
+                variables = len(
+                    Crossword(structure_file, words_file).variables
+                )
+
+                for method in args.methods:
+                    result, seconds, nodes, revisions, rss = measure(
+                        structure_file, words_file, method,
+                        args.workers, args.timeout
+                    )
+                    writer.writerow([
+                        size, args.density, trial, variables,
+                        len(vocabulary), method, result, f"{seconds:.4f}",
+                        nodes, revisions, f"{rss:.1f}"
+                    ])
+                    sys.stdout.flush()
+
+
+def generate_structure(height, width, density, seed=None):
+    """
+    Generate a random crossword structure, as a list of rows with True for
+    open cells.
+
+    Black squares are placed in pairs that are symmetric under a half turn
+    of the grid, until about `density` of the cells are black. Any open
+    cell left outside every word (with no open neighbor across or down)
+    is then blacked out too, so every open cell is part of a word.
+    """
+    rng = random.Random(seed)
+    structure = [[True for _ in range(width)] for _ in range(height)]
+    cells = [(i, j) for i in range(height) for j in range(width)]
+    rng.shuffle(cells)
+    black = 0
+    for i, j in cells:
+        if black >= density * height * width:
+            break
+        if structure[i][j]:
+            for k, l in {(i, j), (height - 1 - i, width - 1 - j)}:
+                structure[k][l] = False
+                black += 1
+
+    def is_open(i, j):
+        return 0 <= i < height and 0 <= j < width and structure[i][j]
+
+    isolated = [
+        (i, j)
+        for i in range(height)
+        for j in range(width)
+        if structure[i][j] and not any(
+            is_open(i + di, j + dj)
+            for di, dj in [(-1, 0), (1, 0), (0, -1), (0, 1)]
+        )
+    ]
+    for i, j in isolated:
+        structure[i][j] = False
+    return structure
+
+
+def sample_vocabulary(words_file, size, seed=None):
+    """
+    Return up to `size` words sampled uniformly without replacement from
+    `words_file`.
+
+    The file is streamed through a reservoir, so only the sample is held in
+    memory; since peak RSS is inherited by child processes, holding a large
+    word list here would inflate every measurement.
+    """
+    rng = random.Random(seed)
+    sample = []
+    with open(words_file) as f:
+        for k, line in enumerate(f):
+            word = line.strip().upper()
+            if len(sample) < size:
+                sample.append(word)
+            else:
+                r = rng.randrange(k + 1)
+                if r < size:
+                    sample[r] = word
+    return sorted(sample)
+
+
+def write_structure(structure, filename):
+    """
+    Write `structure` to a file that `Crossword` can read.
+    """
+    with open(filename, "w") as f:
+        for row in structure:
+            f.write("".join("_" if cell else "#" for cell in row) + "\n")
+
+
+def write_words(words, filename):
+    """
+    Write `words` to a file that `Crossword` can read, one per line.
+    """
+    with open(filename, "w") as f:
+        for word in words:
+            f.write(word + "\n")
+
+
+def run_method(structure_file, words_file, method, workers, timeout):
+    """
+    Solve a puzzle with one method and return (result, seconds, nodes,
+    revisions, peak RSS in megabytes), where result is "solved",
+    "unsolvable" or "timeout".
+
+    Peak RSS covers this process and, for the portfolio, its workers.
+    """
+    start = time.perf_counter()
+    if method == "portfolio":
+        assignment, stats, config = solve_portfolio(
+            structure_file, words_file, workers, timeout=timeout
+        )
+        timed_out = config is None
+        stats = stats or {}
+    else:
+        creator = CrosswordCreator(Crossword(structure_file, words_file))
+        stop = threading.Event()
+        timer = threading.Timer(timeout, stop.set)
+        timer.start()
+        try:
+            assignment = creator.solve(method=method, stop=stop)
+        finally:
+            timer.cancel()
+        timed_out = assignment is None and stop.is_set()
+        stats = creator.stats
+    seconds = time.perf_counter() - start
+
+    if timed_out:
+        result = "timeout"
+    else:
+        result = "unsolvable" if assignment is None else "solved"
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    rss = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    )
+    rss /= 1024 * 1024 if sys.platform == "darwin" else 1024
+    return (
+        result, seconds, stats.get("nodes", ""), stats.get("revisions", ""),
+        rss
+    )
+
+
+def measure(structure_file, words_file, method, workers, timeout):
+    """
+    Run `run_method` in a fresh process, so that its peak RSS is not
+    inflated by earlier runs.
+    """
+    # Executor workers, unlike Pool workers, may start the portfolio's
+    # own worker processes
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(
+        1, mp_context=context
+    ) as executor:
+        return executor.submit(
+            run_method, structure_file, words_file, method, workers, timeout
+        ).result()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,9 @@
+import hashlib
+import mmap
+import os
+import struct
+
+
 class Variable():
 
     ACROSS = "across"
@@ -35,6 +41,265 @@ class Variable():
         return f"Variable({self.i}, {self.j}, {direction}, {self.length})"
 
 
+class Vocabulary():
+    """
+    Index over a set of words, for representing domains as bitsets.
+
+    The words of each length are numbered from 0 in sorted order, and a set
+    of words of one length is an int whose kth bit is set if it contains
+    word k. Words and bitsets are decoded one length at a time, so a
+    vocabulary loaded from a compiled index only decodes what is used.
+    """
+
+    # Compiled index file layout: a header, a table with one entry per word
+    # length, then each length's newline-separated words and its bitsets,
+    # stored as little-endian bytes
+    MAGIC = b"XWINDEX1"
+    HEADER = struct.Struct("<8sQq32sI")
+    LENGTH = struct.Struct("<IIQQQI")
+    ENTRY = struct.Struct("<HIQI")
+
+    def __init__(self, words=()):
+        self.words = dict()
+        self.ids = dict()
+        self.index = dict()
+        self.letters = dict()
+        self.full_sets = dict()
+
+        # For a compiled index: the mapped file, where each length's data is
+        # in it, and where each bitset is in it
+        self.source = None
+        self.table = dict()
+        self.locations = dict()
+
+        groups = dict()
+        for word in words:
+            if word:
+                groups.setdefault(len(word), set()).add(word)
+        for length, group in groups.items():
+            self.add_length(length, sorted(group))
+
+    @classmethod
+    def load(cls, words_file, cache_file=None):
+        """
+        Return the vocabulary of `words_file`, memory-mapping its compiled
+        index from `cache_file` (by default the words file name plus
+        ".idx"). The index is rebuilt if it is missing, or if the words file
+        has changed size, or has a new modification time and a new hash.
+        """
+        if cache_file is None:
+            cache_file = words_file + ".idx"
+        stat = os.stat(words_file)
+        source = None
+        try:
+            with open(cache_file, "rb") as f:
+                source = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, size, mtime, digest, lengths = cls.HEADER.unpack_from(
+                source, 0
+            )
+            valid = magic == cls.MAGIC and size == stat.st_size
+            if valid and mtime != stat.st_mtime_ns:
+                valid = digest == file_digest(words_file)
+
+                # Record the new modification time, so later loads need not
+                # hash the words file again
+                if valid:
+                    try:
+                        with open(cache_file, "r+b") as f:
+                            f.write(cls.HEADER.pack(
+                                magic, size, stat.st_mtime_ns, digest, lengths
+                            ))
+                    except OSError:
+                        pass
+        except (OSError, ValueError, struct.error):
+            valid = False
+        if not valid:
+
+            # Unmap the old index first, since it cannot be replaced while
+            # mapped on some platforms
+            if source is not None:
+                source.close()
+            with open(words_file) as f:
+                vocabulary = cls(f.read().upper().splitlines())
+            try:
+                vocabulary.save(
+                    cache_file, stat.st_size, stat.st_mtime_ns,
+                    file_digest(words_file)
+                )
+            except OSError:
+                pass
+            return vocabulary
+
+        vocabulary = cls()
+        vocabulary.source = source
+        for k in range(lengths):
+            entry = cls.LENGTH.unpack_from(
+                source, cls.HEADER.size + k * cls.LENGTH.size
+            )
+            vocabulary.table[entry[0]] = entry[1:]
+        return vocabulary
+
+    def save(self, cache_file, size, mtime, digest):
+        """
+        Write this vocabulary's compiled index to `cache_file`, recording
+        the size, modification time and hash of the words file.
+        """
+        lengths = sorted(self.words)
+        offset = self.HEADER.size + len(lengths) * self.LENGTH.size
+        table = []
+        blocks = []
+        for length in lengths:
+            self.load_length(length)
+            words = "\n".join(self.words[length]).encode()
+            entries = [
+                key for key in self.index if key[0] == length
+            ]
+            entries_offset = offset + len(words)
+            nbytes = (len(self.words[length]) + 7) // 8
+            data = entries_offset + len(entries) * self.ENTRY.size
+            table.append(self.LENGTH.pack(
+                length, len(self.words[length]), offset, len(words),
+                entries_offset, len(entries)
+            ))
+            blocks.append(words)
+            for k, (_, position, letter) in enumerate(entries):
+                blocks.append(self.ENTRY.pack(
+                    position, ord(letter), data + k * nbytes, nbytes
+                ))
+            for key in entries:
+                blocks.append(self.index[key].to_bytes(nbytes, "little"))
+            offset = data + len(entries) * nbytes
+
+        # Write to a temporary file first, so readers never see half a file
+        temporary = f"{cache_file}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(self.HEADER.pack(
+                self.MAGIC, size, mtime, digest, len(lengths)
+            ))
+            f.writelines(table)
+            f.writelines(blocks)
+        os.replace(temporary, cache_file)
+
+    def add_length(self, length, words):
+        """Number `words`, which all have `length`, and index their letters."""
+        self.words[length] = words
+        for k, word in enumerate(words):
+            self.ids[word] = k
+
+        # Collect the numbers of the words with each letter at each
+        # position, then build each bitset in one go
+        numbers = dict()
+        for k, word in enumerate(words):
+            for position, letter in enumerate(word):
+                numbers.setdefault((position, letter), []).append(k)
+        for (position, letter), ks in numbers.items():
+            bits = bytearray((len(words) + 7) // 8)
+            for k in ks:
+                bits[k >> 3] |= 1 << (k & 7)
+            self.index[length, position, letter] = int.from_bytes(
+                bits, "little"
+            )
+            self.letters.setdefault((length, position), []).append(letter)
+
+    def load_length(self, length):
+        """Decode the words of `length` from the compiled index, if needed."""
+        if length in self.words or length not in self.table:
+            return
+        count, offset, size, entries_offset, entries = self.table[length]
+        words = self.source[offset:offset + size].decode().split("\n")
+        self.words[length] = words if count else []
+        for k, word in enumerate(self.words[length]):
+            self.ids[word] = k
+        for k in range(entries):
+            position, letter, location, nbytes = self.ENTRY.unpack_from(
+                self.source, entries_offset + k * self.ENTRY.size
+            )
+            letter = chr(letter)
+            self.locations[length, position, letter] = (location, nbytes)
+            self.letters.setdefault((length, position), []).append(letter)
+
+    def all_words(self):
+        """Return the set of all words."""
+        for length in self.table:
+            self.load_length(length)
+        return set(self.ids)
+
+    def words_of(self, length):
+        """Return the list of words with the given length, in order."""
+        self.load_length(length)
+        return self.words.get(length, [])
+
+    def full(self, length):
+        """Return the bitset of all words with the given length."""
+        if length not in self.full_sets:
+            self.full_sets[length] = (1 << len(self.words_of(length))) - 1
+        return self.full_sets[length]
+
+    def bit(self, word):
+        """Return the bitset containing just `word`."""
+        self.load_length(len(word))
+        return 1 << self.ids[word]
+
+    def bitset(self, length, position, letter):
+        """
+        Return the bitset of words of the given length with `letter` at
+        `position`.
+        """
+        key = (length, position, letter)
+        if key not in self.index:
+            self.load_length(length)
+            if key not in self.locations:
+                return 0
+            location, nbytes = self.locations[key]
+            self.index[key] = int.from_bytes(
+                self.source[location:location + nbytes], "little"
+            )
+        return self.index[key]
+
+    def letters_at(self, length, position):
+        """
+        Return the letters found at `position` in words of the given length.
+        """
+        self.load_length(length)
+        return self.letters.get((length, position), [])
+
+    def words_in(self, length, bits):
+        """Return the list of words of the given length in `bits`."""
+        words = self.words_of(length)
+        return [words[k] for k in ids(bits)]
+
+    def support(self, length, position, other_length, other_position,
+                bits):
+        """
+        Return the bitset of words of `length` whose letter at `position`
+        matches the letter at `other_position` of some word in `bits`, a
+        bitset of words of `other_length`.
+        """
+        support = 0
+        for letter in self.letters_at(other_length, other_position):
+            if self.bitset(other_length, other_position, letter) & bits:
+                support |= self.bitset(length, position, letter)
+        return support
+
+
+def file_digest(filename):
+    """Return the SHA-256 digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.digest()
+
+
+def ids(bits):
+    """Yield the positions of the set bits of `bits`, in increasing order."""
+    digits = bin(bits)[::-1]
+    k = digits.find("1")
+    while k != -1:
+        yield k
+        k = digits.find("1", k + 1)
+
+
 class Crossword():
 
     def __init__(self, structure_file, words_file):
@@ -57,9 +322,8 @@ class Crossword():
                         row.append(False)
                 self.structure.append(row)
 
-        # Save vocabulary list
-        with open(words_file) as f:
-            self.words = set(f.read().upper().splitlines())
+        # Save vocabulary list, using its compiled index if it is current
+        self.vocabulary = Vocabulary.load(words_file)
 
         # Determine variable set
         self.variables = set()
@@ -105,29 +369,31 @@ class Crossword():
                         ))
 
         # Compute overlaps for each word
-        # For any pair of variables v1, v2, their overlap is either:
-        #    None, if the two variables do not overlap; or
+        # For any pair of neighboring variables v1, v2, overlaps[v1, v2] is
         #    (i, j), where v1's ith character overlaps v2's jth character
+        # Pairs of variables that do not overlap are left out, so use
+        # overlaps.get((v1, v2)) to get None for them
         self.overlaps = dict()
-        for v1 in self.variables:
-            for v2 in self.variables:
-                if v1 == v2:
-                    continue
-                cells1 = v1.cells
-                cells2 = v2.cells
-                intersection = set(cells1).intersection(cells2)
-                if not intersection:
-                    self.overlaps[v1, v2] = None
-                else:
-                    intersection = intersection.pop()
-                    self.overlaps[v1, v2] = (
-                        cells1.index(intersection),
-                        cells2.index(intersection)
-                    )
+        cells = dict()
+        for v in self.variables:
+            for k, cell in enumerate(v.cells):
+                cells.setdefault(cell, []).append((v, k))
+        for shared in cells.values():
+            for v1, k1 in shared:
+                for v2, k2 in shared:
+                    if v1 != v2:
+                        self.overlaps[v1, v2] = (k1, k2)
+
+        # Precompute each variable's set of neighbors
+        self.adjacency = {v: set() for v in self.variables}
+        for v1, v2 in self.overlaps:
+            self.adjacency[v1].add(v2)
+
+    @property
+    def words(self):
+        """The set of all words in the vocabulary."""
+        return self.vocabulary.all_words()
 
     def neighbors(self, var):
         """Given a variable, return set of overlapping variables."""
-        return set(
-            v for v in self.variables
-            if v != var and self.overlaps[v, var]
-        )
+        return self.adjacency[var]
@@ -1,22 +1,209 @@
-import queue
-import sys
+import argparse
+from collections import OrderedDict, deque
+import concurrent.futures
+import math
+import multiprocessing
+import os
+import random
+import time
 
 from crossword import *
+import render
 
 
 
+class SearchLimit(Exception):
+    """
+    Raised to abandon a search that reached its node limit or was stopped.
+    """
+
+
+def luby(i):
+    """
+    Return the ith term, counting from 1, of the Luby sequence
+    1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8, ...
+    """
+    k = 1
+    while True:
+        if i == (1 << k) - 1:
+            return 1 << (k - 1)
+        if (1 << (k - 1)) <= i < (1 << k) - 1:
+            i -= (1 << (k - 1)) - 1
+            k = 1
+        else:
+            k += 1
+
+
+class NogoodTable():
+    """
+    Bounded cache of nogoods: partial assignments, stored as frozensets of
+    (variable, word) pairs, that cannot be extended to a solution.
+    When the table is full, the least recently used nogood is evicted.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.nogoods = OrderedDict()
+
+        # Nogoods containing each (variable, word) pair
+        self.watches = dict()
+
+    def __len__(self):
+        return len(self.nogoods)
+
+    def add(self, nogood):
+        """Add `nogood`, evicting the least recently used one if full."""
+        if nogood in self.nogoods:
+            self.nogoods.move_to_end(nogood)
+            return
+        if len(self.nogoods) >= self.capacity:
+            evicted, _ = self.nogoods.popitem(last=False)
+            for pair in evicted:
+                watching = self.watches[pair]
+                watching.discard(evicted)
+                if not watching:
+                    del self.watches[pair]
+        self.nogoods[nogood] = None
+        for pair in nogood:
+            self.watches.setdefault(pair, set()).add(nogood)
+
+    def find(self, var, value, assignment):
+        """
+        Return the variables of a nogood that assigning `value` to `var`
+        would complete, given `assignment`; return None if there is none.
+        """
+        for nogood in self.watches.get((var, value), ()):
+            if all(v == var or assignment.get(v) == word
+                   for v, word in nogood):
+                self.nogoods.move_to_end(nogood)
+                return {v for v, _ in nogood}
+        return None
+
+
+class ScoreCache():
+    """
+    Memoizes a score(var, word) callback for branch-and-bound search.
+    """
+
+    def __init__(self, score):
+        self.score = score
+        self.scores = dict()
+
+    def get(self, var, word):
+        """Return the score of assigning `word` to `var`."""
+        if (var, word) not in self.scores:
+            self.scores[var, word] = self.score(var, word)
+        return self.scores[var, word]
+
+    def total(self, assignment):
+        """Return the score of a (partial) assignment."""
+        return sum(self.get(var, word) for var, word in assignment.items())
+
+    def bound(self, creator, assignment):
+        """
+        Return an upper bound on the score of any complete assignment that
+        extends `assignment`: its score, plus the best score in the domain
+        of each unassigned variable.
+        """
+        bound = self.total(assignment)
+        for var in creator.crossword.variables:
+            if var not in assignment:
+                bound += max(
+                    (self.get(var, word) for word in creator.domain_words(var)),
+                    default=-math.inf
+                )
+        return bound
+
+
 class CrosswordCreator():
 
     def __init__(self, crossword):
         """
         Create new CSP crossword generate.
+
+        Each domain is a bitset over the words of its variable's length
+        (see `Vocabulary`), so it starts out as every word of that length.
         """
         self.crossword = crossword
+        self.vocabulary = crossword.vocabulary
         self.domains = {
-            var: self.crossword.words.copy()
+            var: self.vocabulary.full(var.length)
+            for var in self.crossword.variables
+        }
+
+        # Size of each domain, kept up to date by `set_domain`, and the
+        # number of neighbors of each variable
+        self.sizes = {
+            var: bits.bit_count() for var, bits in self.domains.items()
+        }
+        self.degrees = {
+            var: len(self.crossword.neighbors(var))
             for var in self.crossword.variables
         }
 
+        # Words used by the assignment being searched
+        self.used = set()
+
+        # Domain changes made during search, as (variable, old domain, old
+        # size) tuples, so they can be undone on backtracking
+        self.trail = []
+
+        # For backjumping: the assigned variables that pruned each
+        # variable's domain, and learned nogoods
+        self.pruned_by = {var: [] for var in self.crossword.variables}
+        self.nogoods = None
+
+        # Random tie-breaking, the node count at which to restart, an
+        # event that stops the search when set, and the time at which to
+        # stop; see `solve` and `iter_solutions`
+        self.random = None
+        self.node_limit = None
+        self.stop = None
+        self.deadline = None
+
+        # Counts of arc revisions made, domain values they pruned, search
+        # nodes expanded, and time spent solving
+        self.stats = {
+            "revisions": 0,
+            "pruned": 0,
+            "nodes": 0,
+            "backjumps": 0,
+            "nogoods": 0,
+            "nogood_hits": 0,
+            "restarts": 0,
+            "seconds": 0
+        }
+
+    def domain_words(self, var):
+        """
+        Return the list of words in the domain of `var`.
+        """
+        return self.vocabulary.words_in(var.length, self.domains[var])
+
+    def domain_size(self, var):
+        """
+        Return the number of words in the domain of `var`.
+        """
+        return self.sizes[var]
+
+    def set_domain(self, var, bits):
+        """
+        Replace the domain of `var` with `bits`, recording the old domain
+        and its size on the trail.
+        """
+        self.trail.append((var, self.domains[var], self.sizes[var]))
+        self.domains[var] = bits
+        self.sizes[var] = bits.bit_count()
+
+    def undo(self, mark):
+        """
+        Restore every domain changed since the trail had length `mark`.
+        """
+        while len(self.trail) > mark:
+            var, bits, size = self.trail.pop()
+            self.domains[var] = bits
+            self.sizes[var] = size
+
     def letter_grid(self, assignment):
         """
         Return 2D array representing a given assignment.
@@ -48,52 +235,166 @@ class CrosswordCreator():
 
     def save(self, assignment, filename):
         """
-        Save crossword assignment to an image file.
+        Save crossword assignment to an image file, or to an SVG file if
+        `filename` ends in ".svg".
         """
-        from PIL import Image, ImageDraw, ImageFont
-        cell_size = 100
-        cell_border = 2
-        interior_size = cell_size - 2 * cell_border
-        letters = self.letter_grid(assignment)
-
-        # Create a blank canvas
-        img = Image.new(
-            "RGBA",
-            (self.crossword.width * cell_size,
-             self.crossword.height * cell_size),
-            "black"
+        render.save(
+            self.crossword.structure, self.letter_grid(assignment), filename
         )
-        font = ImageFont.truetype("assets/fonts/OpenSans-Regular.ttf", 80)
-        draw = ImageDraw.Draw(img)
 
-        for i in range(self.crossword.height):
-            for j in range(self.crossword.width):
-
-                rect = [
-                    (j * cell_size + cell_border,
-                     i * cell_size + cell_border),
-                    ((j + 1) * cell_size - cell_border,
-                     (i + 1) * cell_size - cell_border)
-                ]
-                if self.crossword.structure[i][j]:
-                    draw.rectangle(rect, fill="white")
-                    if letters[i][j]:
-                        w, h = draw.textsize(letters[i][j], font=font)
-                        draw.text(
-                            (rect[0][0] + ((interior_size - w) / 2),
-                             rect[0][1] + ((interior_size - h) / 2) - 10),
-                            letters[i][j], fill="black", font=font
-                        )
+    def solve(self, method="mac", nogood_capacity=10000, seed=None,
+              restart_base=None, stop=None):
+        """
+        Enforce node and arc consistency, and then solve the CSP.
 
-        img.save(filename)
+        `method` is "mac" for backtracking that maintains arc consistency,
+        or "cbj" for conflict-directed backjumping with forward checking,
+        which remembers up to `nogood_capacity` nogoods.
 
-    def solve(self):
+        If `seed` is given, ties between variables and values are broken
+        randomly. If `restart_base` is given, the search restarts after
+        `restart_base` times the next term of the Luby sequence nodes.
+        If `stop` is given, the search gives up once `stop.is_set()`.
+        Search statistics are left in `self.stats`.
         """
-        Enforce node and arc consistency, and then solve the CSP.
+        start = time.perf_counter()
+        self.random = random.Random(seed) if seed is not None else None
+        self.stop = stop
+        self.enforce_node_consistency()
+        result = None
+        if self.ac3():
+            self.trail.clear()
+            if method == "cbj":
+                self.nogoods = NogoodTable(nogood_capacity)
+            attempt = 0
+            while True:
+                attempt += 1
+                self.used.clear()
+                if restart_base is not None:
+                    self.node_limit = (
+                        self.stats["nodes"] + restart_base * luby(attempt)
+                    )
+                try:
+                    if method == "cbj":
+                        result, _ = self.backjump(dict())
+                    else:
+                        result = self.backtrack(dict())
+                    break
+                except SearchLimit:
+
+                    # Return to the root domains; nogoods stay valid
+                    self.undo(0)
+                    for pruned in self.pruned_by.values():
+                        pruned.clear()
+                    if stop is not None and stop.is_set():
+                        break
+                    self.stats["restarts"] += 1
+        self.stats["seconds"] += time.perf_counter() - start
+        return result
+
+    def iter_solutions(self, limit=None, timeout=None, score=None):
         """
+        Enforce node and arc consistency, then yield complete assignments
+        one at a time, continuing the same search for each.
+
+        Stop after `limit` solutions or `timeout` seconds. If `score` is
+        given, it is called as score(var, word), and a fill scores the sum
+        over its variables. Each fill yielded then scores strictly higher
+        than the one before, and branches that cannot beat the best fill so
+        far are pruned, so the last fill yielded is the best one.
+
+        Time spent searching, but not between solutions, is added to
+        `self.stats["seconds"]`.
+        """
+        if limit == 0:
+            return
+        start = time.perf_counter()
         self.enforce_node_consistency()
-        self.ac3()
-        return self.backtrack(dict())
+        if not self.ac3():
+            self.stats["seconds"] += time.perf_counter() - start
+            return
+        self.trail.clear()
+        self.used.clear()
+        if timeout is not None:
+            self.deadline = time.perf_counter() + timeout
+
+        # Best score so far, shared with the search
+        best = [-math.inf]
+        scores = None if score is None else ScoreCache(score)
+        found = 0
+        try:
+            for solution in self.search_solutions(dict(), scores, best):
+                found += 1
+                if scores is not None:
+                    best[0] = scores.total(solution)
+                self.stats["seconds"] += time.perf_counter() - start
+                try:
+                    yield solution
+                finally:
+                    start = time.perf_counter()
+                if limit is not None and found >= limit:
+                    return
+        except SearchLimit:
+            return
+        finally:
+
+            # Leave the domains as they were before the search
+            self.undo(0)
+            self.used.clear()
+            self.deadline = None
+            self.stats["seconds"] += time.perf_counter() - start
+
+    def search_solutions(self, assignment, scores, best):
+        """
+        Yield a copy of each complete assignment that extends `assignment`,
+        backtracking as in `backtrack`.
+
+        If `scores` is given, skip branches whose best possible score is no
+        higher than best[0].
+        """
+        if scores is not None and scores.bound(self, assignment) <= best[0]:
+            return
+        if self.assignment_complete(assignment):
+            yield dict(assignment)
+            return
+        var = self.select_unassigned_variable(assignment)
+        self.expand()
+        values = self.order_domain_values(var, assignment)
+        if scores is not None:
+
+            # Try the highest scoring values first, to raise the bound early
+            values.sort(key=lambda value: -scores.get(var, value))
+        for value in values:
+            if self.consistent_with(var, value, assignment):
+                assignment[var] = value
+                self.used.add(value)
+                mark = len(self.trail)
+                self.set_domain(var, self.vocabulary.bit(value))
+                arcs = [
+                    (z, var) for z in self.crossword.neighbors(var)
+                    if z not in assignment
+                ]
+                if self.ac3(arcs):
+                    yield from self.search_solutions(assignment, scores, best)
+                self.undo(mark)
+                self.used.remove(value)
+                assignment.pop(var)
+
+    def expand(self):
+        """
+        Count a search node, raising SearchLimit if the node limit has been
+        reached or the search has been stopped.
+        """
+        self.stats["nodes"] += 1
+        if (self.node_limit is not None
+                and self.stats["nodes"] >= self.node_limit):
+            raise SearchLimit
+        if self.stats["nodes"] % 64 == 0:
+            if self.stop is not None and self.stop.is_set():
+                raise SearchLimit
+            if (self.deadline is not None
+                    and time.perf_counter() >= self.deadline):
+                raise SearchLimit
 
     def enforce_node_consistency(self):
         """
@@ -102,11 +403,11 @@ class CrosswordCreator():
          constraints; in this case, the length of the word.)
         """
         for variables in self.domains.keys(): # Review and iterates all the variables in the domain 
-            var_length = variables.length 
-            for word in self.crossword.words: # Iterates all the words in the domain
-                if len(word) != var_length:
-                    # Remove any values that are inconsistent with a variable's length
-                    self.domains[variables].remove(word) 
+            # Remove any values that are inconsistent with a variable's length
+            self.set_domain(
+                variables,
+                self.domains[variables] & self.vocabulary.full(variables.length)
+            )
 
     def revise(self, x, y):
         """
@@ -116,27 +417,23 @@ class CrosswordCreator():
 
         Return True if a revision was made to the domain of `x`; return
         False if no revision was made.
-        """        
-        revised = False
-       
-        if self.crossword.overlaps[x,y] is None:
+        """
+        self.stats["revisions"] += 1
+        if self.crossword.overlaps.get((x, y)) is None:
             return False
-        else: # We only pay attention if there is an overlap 
-            x_overlap, y_overlap = self.crossword.overlaps[x,y] # Unpack the overlapping integers
-            
-            # Iterates words in x's and y's domains
-            for x in self.domains[x_overlap]:
-                for y in self.domains[y_overlap]:
-                
-                    if x[x_overlap] != y[y_overlap]: #If no words in y's domain are consistent with any words in x's domain 
-                        self.domains[x_overlap].remove(x) # Removing the word from the domain
-                        revised = True
-
-                    else:
-                        break # No need to check if both words have the same letter overlapped in the same position
-        
-        return revised
 
+        # Keep only the words of x whose overlapping letter is also the
+        # overlapping letter of some word in y's domain
+        x_overlap, y_overlap = self.crossword.overlaps[x, y]
+        support = self.vocabulary.support(
+            x.length, x_overlap, y.length, y_overlap, self.domains[y]
+        )
+        revised = self.domains[x] & support
+        if revised == self.domains[x]:
+            return False
+        self.stats["pruned"] += (self.domains[x] ^ revised).bit_count()
+        self.set_domain(x, revised)
+        return True
 
     def ac3(self, arcs=None):
         """
@@ -147,28 +444,35 @@ class CrosswordCreator():
         Return True if arc consistency is enforced and no domains are empty;
         return False if one or more domains end up empty.
         """
+        # Start with every arc between neighbors, or the arcs given
         if arcs is None:
-            queue = [] # Initialize a list
-            # Adding arcs to the queue
-            for x in self.domains.keys():
-                for y in self.domains.keys():
-                    if x != y: # Each arc is a tuple of x and a different variable of y
-                        queue.append((x,y))
-        else:
-            for x,y in arcs: # Use arcs to initialize a list to make consistent
-                if self.revise(x,y):
-                    if len(self.domains[x]) == 0:
-                        return False # Return false if I remove everything from the x's domain
-
-                    # Add additional arcs to the queue to ensure that other arcs stay consistent
-                    for z in self.crossword.neighbors(x):
-                        if z != y:
-                            queue.append(tuple(z,x))
+            arcs = [
+                (x, y)
+                for x in self.domains
+                for y in self.crossword.neighbors(x)
+            ]
+        queue = deque()
+        queued = set()
+        for arc in arcs:
+            if arc not in queued:
+                queue.append(arc)
+                queued.add(arc)
+
+        while queue:
+            x, y = queue.popleft()
+            queued.remove((x, y))
+            if self.revise(x, y):
+                if not self.domains[x]:
+                    return False # Return false if I remove everything from the x's domain
+
+                # Add additional arcs to the queue to ensure that other arcs stay consistent
+                for z in self.crossword.neighbors(x):
+                    if z != y and (z, x) not in queued:
+                        queue.append((z, x))
+                        queued.add((z, x))
 
         return True
 
-
-
     def assignment_complete(self, assignment):
         """
         Return True if `assignment` is complete (i.e., assigns a value to each
@@ -187,14 +491,14 @@ class CrosswordCreator():
         Return True if `assignment` is consistent (i.e., words fit in crossword
         puzzle without conflicting characters); return False otherwise.
         """
+        words = set()
         for var in assignment:
             word = assignment[var]
             if var.length != len(word): # Checking if every value has the right length
                 return False
             
-            words = []
-            if var not in words:
-                words.append(var)
+            if word not in words:
+                words.add(word)
             else:
                 return False # Checking if every value is distinct
             
@@ -207,6 +511,23 @@ class CrosswordCreator():
 
         return True # Return true if the assignment met all the consistent requirements
 
+    def consistent_with(self, var, value, assignment):
+        """
+        Return True if assigning `value` to `var` keeps an already consistent
+        `assignment` consistent; return False otherwise.
+
+        Only `var` is checked, against its assigned neighbors and against
+        `self.used`, the set of words used by `assignment`.
+        """
+        if var.length != len(value) or value in self.used:
+            return False
+        for neighbor in self.crossword.neighbors(var):
+            if neighbor in assignment:
+                x_overlap, y_overlap = self.crossword.overlaps[var, neighbor]
+                if value[x_overlap] != assignment[neighbor][y_overlap]:
+                    return False
+        return True
+
     def order_domain_values(self, var, assignment):
         """
         Return a list of values in the domain of `var`, in order by
@@ -214,31 +535,45 @@ class CrosswordCreator():
         The first value in the list, for example, should be the one
         that rules out the fewest values among the neighbors of `var`.
         """
-        values = {}
-        neighbors = self.crossword.neighbors(var)
+        neighbors = [
+            neighbor for neighbor in self.crossword.neighbors(var)
+            if neighbor not in assignment
+        ]
 
-        for variable in self.domains[var]:
-            remove = 0
-            # Rule out any variable already present in the assignment
-            if variable in assignment:
+        # For each unassigned neighbor, count how many of its values each
+        # letter at the overlap rules out; only letters that occur at that
+        # position of var's domain need counting
+        ruled_out = []
+        for neighbor in neighbors:
+            x_overlap, y_overlap = self.crossword.overlaps[var, neighbor]
+            counts = dict()
+            for letter in self.vocabulary.letters_at(var.length, x_overlap):
+                index = self.vocabulary.bitset(var.length, x_overlap, letter)
+                if self.domains[var] & index:
+                    keep = self.vocabulary.bitset(
+                        neighbor.length, y_overlap, letter
+                    )
+                    counts[letter] = (
+                        self.sizes[neighbor]
+                        - (self.domains[neighbor] & keep).bit_count()
+                    )
+            ruled_out.append((x_overlap, counts))
+
+        # Add the values and the number of values they rule out for
+        # neighboring variables, skipping words already used
+        values = {}
+        for value in self.domain_words(var):
+            if value in self.used:
                 continue
+            values[value] = sum(
+                counts[value[x_overlap]] for x_overlap, counts in ruled_out
+            )
 
-            for neighbor in neighbors:
-                # Rule out any neighbor already present in the assignment
-                if neighbor in assignment:
-                    continue
-                else:
-                    # Iterate through the overlaps between the variable and neighbors
-                    for var_neighbor in neighbors:
-                        if variable in self.domains[var_neighbor]:
-                            remove += 1 # Counting the number of values ruled out for neighboring unassigned variables
-                            
-            # Add the values and the number of values they rule out for neighboring variables to the list.
-            values[variable] = remove 
-
-        # Sorting the remaining variables in the ascending order
-        return sorted(values, key= lambda key: values[key])
-
+        # Sorting the remaining values in the ascending order
+        if self.random is not None:
+            ties = {value: self.random.random() for value in values}
+            return sorted(values, key=lambda key: (values[key], ties[key]))
+        return sorted(values, key=lambda key: values[key])
 
     def select_unassigned_variable(self, assignment):
         """
@@ -249,16 +584,30 @@ class CrosswordCreator():
         return values.
         """
         choice = None
+        ties = 0
         
         # iterating through unassigned variables
-        for variable in self.crossword.variables - set(assignment):
+        for variable in self.crossword.variables:
+            if variable in assignment:
+                continue
             if choice is None:
                 choice = variable
-            else:
-                if len(self.domains[variable]) < len(self.domains[choice]):
-                    choice = variable # Replace our choice if the variable has fewer number of remaining values in its domain
-                elif len(self.crossword.neighbors(variable)) < len(self.crossword.neighbors(choice)):
-                    choice = variable # Replace our choice with the variable that has the largests degrees
+                ties = 1
+            elif self.sizes[variable] < self.sizes[choice]:
+                choice = variable # Replace our choice if the variable has fewer number of remaining values in its domain
+                ties = 1
+            elif self.sizes[variable] > self.sizes[choice]:
+                continue
+            elif self.degrees[variable] > self.degrees[choice]:
+                choice = variable # Replace our choice with the variable that has the largests degrees
+                ties = 1
+            elif (self.degrees[variable] == self.degrees[choice]
+                    and self.random is not None):
+
+                # Pick uniformly among tied variables when randomizing
+                ties += 1
+                if self.random.randrange(ties) == 0:
+                    choice = variable
 
         return choice
 
@@ -277,41 +626,259 @@ class CrosswordCreator():
             return assignment
         # selects any of the variables that do not have an assignment yet
         var = self.select_unassigned_variable(assignment)
+        self.expand()
         for value in self.order_domain_values(var,assignment):
+            if self.consistent_with(var, value, assignment):
+                assignment[var] = value
+                self.used.add(value)
+
+                # Maintain arc consistency: shrink var's domain to the value
+                # and propagate to its unassigned neighbors
+                mark = len(self.trail)
+                self.set_domain(var, self.vocabulary.bit(value))
+                arcs = [
+                    (z, var) for z in self.crossword.neighbors(var)
+                    if z not in assignment
+                ]
+                if self.ac3(arcs):
+                    result = self.backtrack(assignment)
+                    if result is not None:
+                        return result
+
+                # Undo the propagation before trying the next value
+                self.undo(mark)
+
+                # If the resulting value is failure, then the latest assignment is removed
+                self.used.remove(value)
+                assignment.pop(var)
+        return None
+
+    def forward_check(self, var, value, assignment):
+        """
+        Remove values that conflict with assigning `value` to `var` from
+        the domains of unassigned variables: words that do not fit the
+        overlap with `var`, and `value` itself.
+
+        Return the list of variables whose domains were pruned, and the
+        first variable whose domain became empty (or None).
+        """
+        pruned = []
+        bit = self.vocabulary.bit(value)
+        for z in self.crossword.variables:
+            if z in assignment:
+                continue
+            bits = self.domains[z]
+            overlap = self.crossword.overlaps.get((z, var))
+            if overlap is not None:
+                bits &= self.vocabulary.bitset(
+                    z.length, overlap[0], value[overlap[1]]
+                )
+            if z.length == var.length:
+                bits &= ~bit
+            if bits != self.domains[z]:
+                self.stats["pruned"] += self.sizes[z] - bits.bit_count()
+                self.set_domain(z, bits)
+                self.pruned_by[z].append(var)
+                pruned.append(z)
+                if not bits:
+                    return pruned, z
+        return pruned, None
+
+    def backjump(self, assignment):
+        """
+        Using conflict-directed backjumping with forward checking, take as
+        input a partial assignment and return (assignment, None) with a
+        complete assignment if possible.
+
+        Otherwise return (None, conflict set): the assigned variables that
+        caused the failure. Backjumping returns straight past any variable
+        not in the conflict set, and the conflict set's assignment is
+        learned as a nogood.
+        """
+        if self.assignment_complete(assignment):
+            return assignment, None
+        var = self.select_unassigned_variable(assignment)
+        self.expand()
+
+        conflicts = set()
+        for value in self.order_domain_values(var, assignment):
+
+            # Skip values that complete a learned nogood
+            nogood = self.nogoods.find(var, value, assignment)
+            if nogood is not None:
+                self.stats["nogood_hits"] += 1
+                conflicts |= nogood - {var}
+                continue
+
             assignment[var] = value
-            if self.consistent(assignment):
-                result = self.backtrack(assignment)
+            self.used.add(value)
+            mark = len(self.trail)
+            self.set_domain(var, self.vocabulary.bit(value))
+            pruned, wipeout = self.forward_check(var, value, assignment)
+
+            if wipeout is None:
+                result, conflict = self.backjump(assignment)
                 if result is not None:
-                    return result
-            # If the resulting value is failure, then the latest assignment is removed
-            assignment.pop(var)
-        return None
+                    return result, None
+                if var not in conflict:
+
+                    # The failure below does not depend on var: jump past it
+                    self.stats["backjumps"] += 1
+                    self.unassign(var, value, assignment, mark, pruned)
+                    return None, conflict
+                conflicts |= conflict - {var}
+            else:
+                conflicts |= set(self.pruned_by[wipeout]) - {var}
+            self.unassign(var, value, assignment, mark, pruned)
+
+        # Every value failed because of the conflicts found, or because of
+        # the assignments that pruned var's domain
+        conflicts |= set(self.pruned_by[var])
+        self.nogoods.add(frozenset((v, assignment[v]) for v in conflicts))
+        self.stats["nogoods"] += 1
+        return None, conflicts
 
+    def unassign(self, var, value, assignment, mark, pruned):
+        """
+        Undo assigning `value` to `var` and the forward checking it did.
+        """
+        for z in pruned:
+            self.pruned_by[z].pop()
+        self.undo(mark)
+        self.used.remove(value)
+        assignment.pop(var)
+
+
+
+# Event shared by portfolio workers, set when one of them has finished
+portfolio_stop = None
+
+
+def portfolio_configs(workers, method="mac"):
+    """
+    Return `solve` options for each of `workers` portfolio searches.
+    The first is the deterministic search with `method`; the others
+    alternate methods, starting with the other one, with their own seeds
+    and restart schedules.
+    """
+    other = "cbj" if method == "mac" else "mac"
+    configs = [{"method": method}]
+    for i in range(1, workers):
+        configs.append({
+            "method": other if i % 2 else method,
+            "seed": i,
+            "restart_base": 50 * (1 + i // 2)
+        })
+    return configs
+
+
+def init_portfolio_worker(stop):
+    global portfolio_stop
+    portfolio_stop = stop
+
+
+def run_portfolio_search(structure, words, config):
+    """
+    Run one portfolio search, returning (assignment, stats, config).
+    """
+    creator = CrosswordCreator(Crossword(structure, words))
+    assignment = creator.solve(stop=portfolio_stop, **config)
+    return assignment, creator.stats, config
+
+
+def solve_portfolio(structure, words, workers, timeout=None, method="mac"):
+    """
+    Race `workers` differently configured searches in a process pool,
+    the first of them a plain search with `method`.
+    Return (assignment, stats, config) from the first search to finish,
+    after stopping the others, or (None, None, None) if none finishes
+    within `timeout` seconds.
+
+    Every search is complete, so a search that finishes without an
+    assignment has shown there is no solution.
+    """
+    stop = multiprocessing.Event()
+    with concurrent.futures.ProcessPoolExecutor(
+        workers, initializer=init_portfolio_worker, initargs=(stop,)
+    ) as executor:
+        futures = [
+            executor.submit(run_portfolio_search, structure, words, config)
+            for config in portfolio_configs(workers, method)
+        ]
+        done, _ = concurrent.futures.wait(
+            futures, timeout=timeout,
+            return_when=concurrent.futures.FIRST_COMPLETED
+        )
+        stop.set()
+        if not done:
+            return None, None, None
+        return next(iter(done)).result()
 
 
 def main():
 
     # Check usage
-    if len(sys.argv) not in [3, 4]:
-        sys.exit("Usage: python generate.py structure words [output]")
-
-    # Parse command-line arguments
-    structure = sys.argv[1]
-    words = sys.argv[2]
-    output = sys.argv[3] if len(sys.argv) == 4 else None
+    parser = argparse.ArgumentParser(
+        usage="python generate.py structure words [output] "
+              "[--method mac|cbj] [--workers N] [--solutions N] [--stats]"
+    )
+    parser.add_argument("structure")
+    parser.add_argument("words")
+    parser.add_argument("output", nargs="?", default=None)
+    parser.add_argument("--method", choices=["mac", "cbj"], default="mac",
+                        help="search with arc consistency (mac) or "
+                             "conflict-directed backjumping (cbj)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="race this many differently configured "
+                             "searches in parallel")
+    parser.add_argument("--solutions", type=int, default=1,
+                        help="print up to this many distinct fills, saving "
+                             "each to a numbered output file")
+    parser.add_argument("--stats", action="store_true",
+                        help="print search and propagation statistics")
+    args = parser.parse_args()
 
     # Generate crossword
-    crossword = Crossword(structure, words)
+    crossword = Crossword(args.structure, args.words)
     creator = CrosswordCreator(crossword)
-    assignment = creator.solve()
+    if args.solutions > 1:
+        grids = []
+        for k, assignment in enumerate(
+            creator.iter_solutions(limit=args.solutions)
+        ):
+            if k:
+                print()
+            creator.print(assignment)
+            if args.output:
+                stem, extension = os.path.splitext(args.output)
+                grids.append((
+                    crossword.structure, creator.letter_grid(assignment),
+                    f"{stem}{k + 1}{extension}"
+                ))
+        if grids:
+            render.save_many(grids, max(args.workers, 1))
+        if args.stats:
+            for name, value in creator.stats.items():
+                print(f"{name}: {value}")
+        return
+    if args.workers > 1:
+        assignment, stats, config = solve_portfolio(
+            args.structure, args.words, args.workers, method=args.method
+        )
+        creator.stats = dict(stats, **config)
+    else:
+        assignment = creator.solve(method=args.method)
 
     # Print result
     if assignment is None:
         print("No solution.")
     else:
         creator.print(assignment)
-        if output:
-            creator.save(assignment, output)
+        if args.output:
+            creator.save(assignment, args.output)
+    if args.stats:
+        for name, value in creator.stats.items():
+            print(f"{name}: {value}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,158 @@
+import concurrent.futures
+import os
+from xml.sax.saxutils import escape
+
+FONT = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "assets", "fonts", "OpenSans-Regular.ttf"
+)
+
+
+class Renderer():
+    """
+    Renders crossword grids to images by pasting pre-rendered cell tiles.
+
+    Each letter's tile (a white cell with the letter centered on it) is
+    drawn once, the first time it is needed; A-Z are drawn up front. Font
+    measurement happens only while drawing tiles, never per cell.
+    """
+
+    def __init__(self, cell_size=100, cell_border=2, font_size=80,
+                 font_file=FONT):
+        from PIL import Image, ImageFont
+        self.cell_size = cell_size
+        self.cell_border = cell_border
+        self.interior_size = cell_size - 2 * cell_border
+        self.font = ImageFont.truetype(font_file, font_size)
+        self.blank = Image.new(
+            "RGBA", (self.interior_size + 1, self.interior_size + 1), "white"
+        )
+        self.tiles = dict()
+        for letter in "ABCDEFGHIJKLMNOPQRSTUVWXYZ":
+            self.tile(letter)
+
+    def tile(self, letter):
+        """
+        Return the tile for a cell containing `letter`.
+        """
+        if letter not in self.tiles:
+            from PIL import ImageDraw
+            tile = self.blank.copy()
+            draw = ImageDraw.Draw(tile)
+            left, top, right, bottom = draw.textbbox(
+                (0, 0), letter, font=self.font
+            )
+            draw.text(
+                ((self.interior_size - (right - left)) / 2 - left,
+                 (self.interior_size - (bottom - top)) / 2 - top),
+                letter, fill="black", font=self.font
+            )
+            self.tiles[letter] = tile
+        return self.tiles[letter]
+
+    def render(self, structure, letters):
+        """
+        Return an image of a grid, given its structure (True for open
+        cells) and its letters (None for empty cells).
+        """
+        from PIL import Image
+        height = len(structure)
+        width = len(structure[0]) if structure else 0
+        img = Image.new(
+            "RGBA",
+            (width * self.cell_size, height * self.cell_size),
+            "black"
+        )
+        for i in range(height):
+            for j in range(width):
+                if structure[i][j]:
+                    letter = letters[i][j]
+                    img.paste(
+                        self.tile(letter) if letter else self.blank,
+                        (j * self.cell_size + self.cell_border,
+                         i * self.cell_size + self.cell_border)
+                    )
+        return img
+
+    def save(self, structure, letters, filename):
+        """
+        Save a grid to `filename`, as SVG if it ends in ".svg" and as an
+        image in the format given by its extension otherwise.
+        """
+        if filename.lower().endswith(".svg"):
+            with open(filename, "w") as f:
+                f.write(render_svg(
+                    structure, letters, self.cell_size, self.cell_border
+                ))
+        else:
+            self.render(structure, letters).save(filename)
+
+
+def render_svg(structure, letters, cell_size=100, cell_border=2):
+    """
+    Return an SVG document for a grid, leaving text layout to the viewer.
+    """
+    height = len(structure)
+    width = len(structure[0]) if structure else 0
+    interior_size = cell_size - 2 * cell_border
+    font_size = cell_size * 4 // 5
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" '
+        f'width="{width * cell_size}" height="{height * cell_size}">',
+        f'<rect width="100%" height="100%" fill="black"/>',
+        f'<g font-family="Open Sans, sans-serif" font-size="{font_size}" '
+        f'text-anchor="middle" dominant-baseline="central">'
+    ]
+    for i in range(height):
+        for j in range(width):
+            if structure[i][j]:
+                x = j * cell_size + cell_border
+                y = i * cell_size + cell_border
+                parts.append(
+                    f'<rect x="{x}" y="{y}" width="{interior_size}" '
+                    f'height="{interior_size}" fill="white"/>'
+                )
+                if letters[i][j]:
+                    parts.append(
+                        f'<text x="{x + interior_size / 2}" '
+                        f'y="{y + interior_size / 2}">'
+                        f'{escape(letters[i][j])}</text>'
+                    )
+    parts.append("</g></svg>")
+    return "\n".join(parts) + "\n"
+
+
+# Renderer shared by everything rendered in this process
+renderer = None
+
+
+def get_renderer():
+    """
+    Return this process's renderer, creating it on first use.
+    """
+    global renderer
+    if renderer is None:
+        renderer = Renderer()
+    return renderer
+
+
+def save(structure, letters, filename):
+    """
+    Save a grid to `filename` with this process's renderer.
+    """
+    get_renderer().save(structure, letters, filename)
+
+
+def save_many(grids, workers=None):
+    """
+    Save many grids, given as (structure, letters, filename) tuples, across
+    a pool of `workers` processes. Each process draws its letter tiles
+    once and reuses them for every grid it saves.
+    """
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        futures = [
+            executor.submit(save, structure, letters, filename)
+            for structure, letters, filename in grids
+        ]
+        for future in concurrent.futures.as_completed(futures):
+            future.result()
@@ -0,0 +1,251 @@
+import argparse
+import concurrent.futures
+import csv
+import itertools
+import json
+import math
+import os
+import sys
+
+from heredity import (
+    load_data, load_rows, enumerate_probabilities,
+    likelihood_weighting, gibbs_sampling
+)
+
+GENES = [0, 1, 2]
+TRAITS = [False, True]
+
+
+def main():
+
+    # Check for proper usage
+    parser = argparse.ArgumentParser(
+        usage="python batch.py (directory | families.csv) [options]"
+    )
+    parser.add_argument("input")
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+    parser.add_argument("--method", choices=["exact", "sample"],
+                        default="exact")
+    parser.add_argument("--sampler", choices=["likelihood", "gibbs"],
+                        default="likelihood")
+    parser.add_argument("--samples", type=int, default=10000)
+    parser.add_argument("--target-error", type=float, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    options = {
+        "method": args.method,
+        "sampler": args.sampler,
+        "samples": args.samples,
+        "target_error": args.target_error,
+        "seed": args.seed
+    }
+    if os.path.isdir(args.input):
+        families = directory_families(args.input)
+    else:
+        families = stream_families(args.input)
+
+    output = open(args.output, "w", newline="") if args.output else sys.stdout
+    failures = 0
+    try:
+        writer = ResultWriter(output, args.format, args.method == "sample")
+        for result in run_batch(families, options, args.workers):
+            writer.write(*result)
+            if result[3] is not None:
+                failures += 1
+                print(f"{result[0]}: {result[3]}", file=sys.stderr)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    if failures:
+        sys.exit(f"{failures} families failed")
+
+
+def directory_families(directory):
+    """
+    Yield (family_id, filename) for each CSV file in `directory`, using the
+    file name without its extension as the family id.
+    """
+    for entry in sorted(os.scandir(directory), key=lambda e: e.name):
+        name, extension = os.path.splitext(entry.name)
+        if entry.is_file() and extension == ".csv":
+            yield name, entry.path
+
+
+def stream_families(filename):
+    """
+    Yield (family_id, people) for each family in a CSV file with fields
+    family_id, name, mother, father, trait. Rows for a family must be
+    contiguous; only one family is held in memory at a time.
+    """
+    with open(filename) as f:
+        reader = csv.DictReader(f)
+        for family_id, rows in itertools.groupby(
+            reader, key=lambda row: row["family_id"]
+        ):
+            yield family_id, load_rows(rows)
+
+
+def infer_family(family_id, family, options):
+    """
+    Compute gene and trait distributions for one family, given either its
+    people or the name of its CSV file.
+
+    Return (family_id, probabilities, errors), with errors None for exact
+    inference.
+    """
+    people = load_data(family) if isinstance(family, str) else family
+    if options["method"] == "exact":
+        return family_id, enumerate_probabilities(people), None
+
+    sampler = (likelihood_weighting if options["sampler"] == "likelihood"
+               else gibbs_sampling)
+    seed = options["seed"]
+    probabilities, errors, _, _ = sampler(
+        people, options["samples"],
+        target_error=options["target_error"],
+        seed=None if seed is None else f"{seed}:{family_id}"
+    )
+    return family_id, probabilities, errors
+
+
+def run_batch(families, options, workers):
+    """
+    Run `infer_family` on each (family_id, family) in `families` across a
+    pool of `workers` processes, yielding (family_id, probabilities,
+    errors, failure) as each family finishes.
+
+    A family that raises an exception is yielded with probabilities and
+    errors None and a description of the exception as `failure`, so one
+    malformed family does not stop the others; `failure` is None for every
+    other family.
+
+    At most a few families per worker are submitted ahead of the results,
+    so memory stays bounded however many families there are. Each worker
+    imports heredity once, so its compiled factor tables are shared by
+    every family it processes.
+    """
+    if workers <= 1:
+        for family_id, family in families:
+            try:
+                yield infer_family(family_id, family, options) + (None,)
+            except Exception as e:
+                yield family_id, None, None, describe(e)
+        return
+
+    limit = workers * 4
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        pending = dict()
+        for family_id, family in families:
+            future = executor.submit(infer_family, family_id, family, options)
+            pending[future] = family_id
+            if len(pending) >= limit:
+                done, _ = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    yield outcome(future, pending.pop(future))
+        for future in concurrent.futures.as_completed(pending):
+            yield outcome(future, pending[future])
+
+
+def outcome(future, family_id):
+    """
+    Return the (family_id, probabilities, errors, failure) result of a
+    finished `infer_family` call.
+    """
+    try:
+        return future.result() + (None,)
+    except Exception as e:
+        return family_id, None, None, describe(e)
+
+
+def describe(error):
+    """
+    Return a one-line description of an exception.
+    """
+    return f"{type(error).__name__}: {error}"
+
+
+class ResultWriter():
+    """
+    Writes one row per person, as CSV or JSON lines, flushing after each
+    family so results appear as soon as they are computed.
+    """
+
+    def __init__(self, output, format, errors):
+        self.output = output
+        self.format = format
+        if format == "csv":
+            fields = (
+                ["family_id", "name"]
+                + [f"gene_{g}" for g in GENES]
+                + [f"trait_{str(t).lower()}" for t in TRAITS]
+            )
+            if errors:
+                fields += [f"{field}_se" for field in fields[2:]]
+            self.writer = csv.writer(output)
+            self.writer.writerow(fields)
+
+    def write(self, family_id, probabilities, errors, failure=None):
+        if failure is not None:
+            self.write_failure(family_id, failure)
+            return
+        for person in probabilities:
+            if self.format == "csv":
+                row = [family_id, person] + self.values(probabilities[person])
+                if errors is not None:
+                    row += self.values(errors[person])
+                self.writer.writerow(row)
+            else:
+                record = {
+                    "family_id": family_id,
+                    "name": person,
+                    "gene": probabilities[person]["gene"],
+                    "trait": probabilities[person]["trait"]
+                }
+                if errors is not None:
+                    record["errors"] = finite(errors[person])
+                self.output.write(json.dumps(record) + "\n")
+        self.output.flush()
+
+    def write_failure(self, family_id, failure):
+        """
+        Write a record of a family that could not be processed: a row with
+        no name and the failure in place of the values in CSV, or a
+        record with an "error" field in JSON lines.
+        """
+        if self.format == "csv":
+            self.writer.writerow([family_id, "", failure])
+        else:
+            self.output.write(json.dumps({
+                "family_id": family_id,
+                "error": failure
+            }) + "\n")
+        self.output.flush()
+
+    def values(self, distributions):
+        return (
+            [distributions["gene"][g] for g in GENES]
+            + [distributions["trait"][t] for t in TRAITS]
+        )
+
+
+def finite(distributions):
+    """
+    Return distributions with NaN values, which JSON cannot represent,
+    replaced by None.
+    """
+    return {
+        field: {
+            value: None if math.isnan(p) else p
+            for value, p in distributions[field].items()
+        }
+        for field in distributions
+    }
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+import argparse
+import csv
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import time
+
+from heredity import (
+    FACTORS, NO_PARENT, enumerate_probabilities, likelihood_weighting,
+    gibbs_sampling, sample_index
+)
+
+METHODS = ["exact", "likelihood", "gibbs"]
+
+
+def main():
+
+    # Check for proper usage
+    parser = argparse.ArgumentParser(
+        usage="python benchmark.py [--generations N] [--family-size N] "
+              "[--observed FRACTION] [options]"
+    )
+    parser.add_argument("--generations", type=int, default=4)
+    parser.add_argument("--family-size", type=int, default=2)
+    parser.add_argument("--observed", type=float, default=0.5)
+    parser.add_argument("--samples", type=int, default=5000)
+    parser.add_argument("--max-exact", type=int, default=10)
+    parser.add_argument("--methods", nargs="+", choices=METHODS,
+                        default=METHODS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", default=None,
+                        help="directory to write the generated families to")
+    args = parser.parse_args()
+
+    writer = csv.writer(sys.stdout)
+    writer.writerow([
+        "generations", "people", "method", "seconds", "peak_rss_mb",
+        "max_abs_error"
+    ])
+
+    # Time every method on families of increasing size
+    for generations in range(1, args.generations + 1):
+        people = generate_pedigree(
+            generations, args.family_size, args.observed,
+            seed=f"{args.seed}:{generations}"
+        )
+        if args.save:
+            os.makedirs(args.save, exist_ok=True)
+            write_pedigree(
+                people, os.path.join(args.save, f"family_g{generations}.csv")
+            )
+
+        exact = None
+        if len(people) <= args.max_exact:
+            exact = measure(people, "exact", args.samples, args.seed)
+        for method in args.methods:
+            if method == "exact":
+                if exact is None:
+                    continue
+                result = exact
+            else:
+                result = measure(people, method, args.samples, args.seed)
+            probabilities, seconds, rss = result
+            error = (max_difference(probabilities, exact[0])
+                     if exact is not None else "")
+            writer.writerow([
+                generations, len(people), method, f"{seconds:.4f}",
+                f"{rss:.1f}", f"{error:.4f}" if error != "" else ""
+            ])
+            sys.stdout.flush()
+
+
+def generate_pedigree(generations, family_size, observed, seed=None):
+    """
+    Generate a random family in the format returned by `load_data`.
+
+    The family starts with one couple. In each later generation, every
+    child of the previous generation has a partner from outside the family
+    and `family_size` children with them. Genes and traits are sampled
+    from the model in PROBS, and each trait is observed with probability
+    `observed`.
+    """
+    rng = random.Random(seed)
+    inherit = FACTORS["inherit"]
+    trait_probs = FACTORS["trait"]
+    people = dict()
+    genes = dict()
+
+    def add_person(mother, father):
+        name = f"P{len(people)}"
+        parents = (
+            (NO_PARENT, NO_PARENT) if mother is None
+            else (genes[mother], genes[father])
+        )
+        genes[name] = sample_index(rng, inherit[parents[0]][parents[1]])
+        trait = None
+        if rng.random() < observed:
+            trait = rng.random() < trait_probs[genes[name]]
+        people[name] = {
+            "name": name,
+            "mother": mother,
+            "father": father,
+            "trait": trait
+        }
+        return name
+
+    # Each generation is a list of people who will go on to have children
+    generation = [add_person(None, None)]
+    for _ in range(generations):
+        children = []
+        for person in generation:
+            partner = add_person(None, None)
+            mother, father = ((person, partner) if rng.random() < 0.5
+                              else (partner, person))
+            for _ in range(family_size):
+                children.append(add_person(mother, father))
+        generation = children
+    return people
+
+
+def write_pedigree(people, filename):
+    """
+    Write `people` to a CSV file that `load_data` can read.
+    """
+    with open(filename, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "mother", "father", "trait"])
+        for person in people.values():
+            trait = person["trait"]
+            writer.writerow([
+                person["name"], person["mother"] or "",
+                person["father"] or "",
+                "" if trait is None else int(trait)
+            ])
+
+
+def run_method(people, method, samples, seed):
+    """
+    Run one inference method and return (probabilities, seconds, peak RSS
+    in megabytes) for the process it ran in.
+    """
+    start = time.perf_counter()
+    if method == "exact":
+        probabilities = enumerate_probabilities(people)
+    else:
+        sampler = (likelihood_weighting if method == "likelihood"
+                   else gibbs_sampling)
+        probabilities, _, _, _ = sampler(people, samples, seed=seed)
+    seconds = time.perf_counter() - start
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss /= 1024 * 1024 if sys.platform == "darwin" else 1024
+    return probabilities, seconds, rss
+
+
+def measure(people, method, samples, seed):
+    """
+    Run `run_method` in a fresh process, so that its peak RSS is not
+    inflated by earlier runs.
+    """
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        return pool.apply(run_method, (people, method, samples, seed))
+
+
+def max_difference(probabilities, exact):
+    """
+    Return the largest absolute difference between two sets of
+    distributions.
+    """
+    return max(
+        abs(probabilities[person][field][value]
+            - exact[person][field][value])
+        for person in exact
+        for field in exact[person]
+        for value in exact[person][field]
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,10 @@
+import argparse
 import csv
 from gettext import translation
 import itertools
+import math
 from ntpath import join
-import sys
+import random
 
 PROBS = {
 
@@ -39,15 +41,118 @@ PROBS = {
 }
 
 
+# Index used in place of a parent's genes for people with no parents listed
+NO_PARENT = 3
+
+# Index used in place of a trait that has not been observed
+UNKNOWN = 2
+
+# Effective sample size below which likelihood weighting does not trust
+# its standard errors, since its weights have collapsed onto a few samples
+MIN_EFFECTIVE_SAMPLES = 100
+
+
+def compile_factors(probs):
+    """
+    Precompute every factor of the joint probability from `probs`.
+
+    Return a dictionary in which
+        * inherit[m][f][g] is the probability that a person whose mother and
+          father have m and f copies of the gene has g copies, with
+          m = f = NO_PARENT giving the unconditional probability,
+        * trait[g] is the probability of having the trait given g copies,
+        * log_trait[g][t] is the log probability of trait t (0 or 1)
+          given g copies, and
+        * log[m][f][g][t] is the log of inherit[m][f][g] times the
+          probability of trait t, with t = UNKNOWN leaving the trait out.
+    """
+    mutation = probs["mutation"]
+    passes = [mutation, 0.5, 1 - mutation]
+
+    inherit = [[None] * 4 for _ in range(4)]
+    for m in range(3):
+        for f in range(3):
+            pm, pf = passes[m], passes[f]
+            inherit[m][f] = [
+                (1 - pm) * (1 - pf),
+                (1 - pm) * pf + (1 - pf) * pm,
+                pm * pf
+            ]
+    inherit[NO_PARENT][NO_PARENT] = [probs["gene"][g] for g in range(3)]
+
+    trait = [probs["trait"][g][True] for g in range(3)]
+    log_trait = [
+        [log(probs["trait"][g][False]), log(probs["trait"][g][True])]
+        for g in range(3)
+    ]
+
+    table = [[None] * 4 for _ in range(4)]
+    for m in range(4):
+        for f in range(4):
+            if inherit[m][f] is None:
+                continue
+            table[m][f] = [
+                [log(inherit[m][f][g]) + log_trait[g][0],
+                 log(inherit[m][f][g]) + log_trait[g][1],
+                 log(inherit[m][f][g])]
+                for g in range(3)
+            ]
+
+    return {
+        "inherit": inherit,
+        "trait": trait,
+        "log_trait": log_trait,
+        "log": table
+    }
+
+
+def log(p):
+    """
+    Return the natural logarithm of `p`, or -inf if `p` is 0.
+    """
+    return math.log(p) if p > 0 else -math.inf
+
+
+FACTORS = compile_factors(PROBS)
+
+
 def main():
 
     # Check for proper usage
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python heredity.py data.csv")
-    people = load_data(sys.argv[1])
+    parser = argparse.ArgumentParser(
+        usage="python heredity.py data.csv [--method exact|sample]"
+    )
+    parser.add_argument("data")
+    parser.add_argument("--method", choices=["exact", "sample"],
+                        default="exact")
+    parser.add_argument("--sampler", choices=["likelihood", "gibbs"],
+                        default="likelihood")
+    parser.add_argument("--samples", type=int, default=10000)
+    parser.add_argument("--target-error", type=float, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    people = load_data(args.data)
+
+    # Compute gene and trait probabilities for each person
+    if args.method == "exact":
+        probabilities = enumerate_probabilities(people)
+        print_probabilities(probabilities)
+    else:
+        sampler = (likelihood_weighting if args.sampler == "likelihood"
+                   else gibbs_sampling)
+        probabilities, errors, n, effective = sampler(
+            people, args.samples,
+            target_error=args.target_error, seed=args.seed
+        )
+        print(f"Samples: {n} (effective: {effective:.1f})")
+        print_probabilities(probabilities, errors)
 
-    # Keep track of gene and trait probabilities for each person
-    probabilities = {
+
+def empty_probabilities(people):
+    """
+    Return a gene and trait distribution for each person, all set to 0.
+    """
+    return {
         person: {
             "gene": {
                 2: 0,
@@ -62,38 +167,65 @@ def main():
         for person in people
     }
 
-    # Loop over all sets of people who might have the trait
-    names = set(people)
-    for have_trait in powerset(names):
-
-        # Check if current set of people violates known information
-        fails_evidence = any(
-            (people[person]["trait"] is not None and
-             people[person]["trait"] != (person in have_trait))
-            for person in names
-        )
-        if fails_evidence:
-            continue
-
-        # Loop over all sets of people who might have the gene
-        for one_gene in powerset(names):
-            for two_genes in powerset(names - one_gene):
 
-                # Update probabilities with new joint probability
-                p = joint_probability(people, one_gene, two_genes, have_trait)
-                update(probabilities, one_gene, two_genes, have_trait, p)
+def enumerate_probabilities(people):
+    """
+    Compute exact gene and trait distributions for each person by
+    enumerating every possible assignment of genes. Traits that have not
+    been observed are summed out rather than enumerated.
+    """
+    pedigree = Pedigree(people)
+    n = len(pedigree.names)
+    trait_probs = FACTORS["trait"]
+
+    # Keep track of gene and trait probabilities for each person, as
+    # multiples of exp(shift) so that small joint probabilities add up
+    # without underflowing
+    rows = [[0] * 5 for _ in range(n)]
+    shift = -math.inf
+
+    # Loop over every assignment of genes
+    genes = pedigree.genes()
+    for assignment in itertools.product(range(3), repeat=n):
+        genes[:n] = assignment
+
+        # Update probabilities with new joint probability, scaled
+        # relative to the largest one seen so far
+        logp = pedigree.log_probability(genes, pedigree.trait)
+        if logp > shift:
+            rescale(rows, math.exp(shift - logp))
+            shift = logp
+        p = math.exp(logp - shift)
+        for row, g, t in zip(rows, assignment, pedigree.trait):
+            row[g] += p
+            if t == UNKNOWN:
+                q = p * trait_probs[g]
+                row[3] += p - q
+                row[4] += q
+            else:
+                row[3 + t] += p
 
     # Ensure probabilities sum to 1
+    probabilities = pedigree.to_probabilities(rows)
     normalize(probabilities)
+    return probabilities
 
-    # Print results
-    for person in people:
+
+def print_probabilities(probabilities, errors=None):
+    """
+    Print each person's distributions, with standard errors if given.
+    """
+    for person in probabilities:
         print(f"{person}:")
         for field in probabilities[person]:
             print(f"  {field.capitalize()}:")
             for value in probabilities[person][field]:
                 p = probabilities[person][field][value]
-                print(f"    {value}: {p:.4f}")
+                if errors is None:
+                    print(f"    {value}: {p:.4f}")
+                else:
+                    e = errors[person][field][value]
+                    print(f"    {value}: {p:.4f} ± {e:.4f}")
 
 
 def load_data(filename):
@@ -103,18 +235,25 @@ def load_data(filename):
     mother, father must both be blank, or both be valid names in the CSV.
     trait should be 0 or 1 if trait is known, blank otherwise.
     """
-    data = dict()
     with open(filename) as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            name = row["name"]
-            data[name] = {
-                "name": name,
-                "mother": row["mother"] or None,
-                "father": row["father"] or None,
-                "trait": (True if row["trait"] == "1" else
-                          False if row["trait"] == "0" else None)
-            }
+        return load_rows(csv.DictReader(f))
+
+
+def load_rows(rows):
+    """
+    Load gene and trait data from an iterable of CSV rows (dictionaries with
+    keys name, mother, father, trait) into a dictionary, as in `load_data`.
+    """
+    data = dict()
+    for row in rows:
+        name = row["name"]
+        data[name] = {
+            "name": name,
+            "mother": row["mother"] or None,
+            "father": row["father"] or None,
+            "trait": (True if row["trait"] == "1" else
+                      False if row["trait"] == "0" else None)
+        }
     return data
 
 
@@ -141,37 +280,22 @@ def joint_probability(people, one_gene, two_genes, have_trait):
         * everyone in set `have_trait` has the trait, and
         * everyone not in set` have_trait` does not have the trait.
     """
+    return math.exp(
+        log_joint_probability(people, one_gene, two_genes, have_trait)
+    )
 
-    jointProb = 1
-
-    for person in people:
-
-        geneNumber = 1 if person in one_gene else 2 if person in two_genes else 0
-        childProb = 1
-        
-        if people[person]['mother'] == None: #If person has no parents, use unconditional gene probability
-            jointProb *= PROBS['gene'][geneNumber]
-        else: # Calculating the probability of a child inheriting the mutated gene from their parents
-            mother = people[person]['mother']
-            father = people[person]['father']
-            
-            # Returns the probabilities of parents passing down the mutated genes to their child
-            motherGene = 0.5 if mother in one_gene else 1 - PROBS['mutation'] if mother in two_genes else PROBS['mutation']
-            fatherGene = 0.5 if father in one_gene else 1 - PROBS['mutation'] if father in two_genes else PROBS['mutation']
-
-            if geneNumber == 0:
-                childProb *= (1 - motherGene) * (1 - fatherGene) # None of the parents pass down the gene
-            elif geneNumber == 1:
-                childProb *= (1 - motherGene) * fatherGene + (1 - fatherGene) * motherGene # One of the parents pass down the gene
-            elif geneNumber == 2:
-                childProb *= motherGene * fatherGene # Both parents pass down a gene
-
-        childProb *= PROBS['trait'][geneNumber][person in have_trait] # Multiply by the probability that an individual with gene(s) will have or not have the trait:
-            
-        jointProb *= childProb
-
-    return jointProb 
 
+def log_joint_probability(people, one_gene, two_genes, have_trait):
+    """
+    Compute and return the natural logarithm of `joint_probability`,
+    summing precomputed log factors so large families do not underflow.
+    """
+    pedigree = Pedigree(people)
+    genes = pedigree.genes()
+    for i, name in enumerate(pedigree.names):
+        genes[i] = 1 if name in one_gene else 2 if name in two_genes else 0
+    traits = [int(name in have_trait) for name in pedigree.names]
+    return pedigree.log_probability(genes, traits)
 
 
 def update(probabilities, one_gene, two_genes, have_trait, p):
@@ -206,13 +330,378 @@ def normalize(probabilities):
         for j in probabilities[people]["trait"]:
             sumTrait += probabilities[people]["trait"][j] 
         
-        # normalise each distribution to the sum of 1
-        for x in probabilities[people]["gene"]:
-            probabilities[people]["gene"][x] /= sumGene
-        for y in probabilities[people]["trait"]:
-            probabilities[people]["trait"][y] /= sumTrait
+        # normalise each distribution to the sum of 1, leaving it alone if
+        # every value underflowed or contradicts the evidence
+        if sumGene > 0:
+            for x in probabilities[people]["gene"]:
+                probabilities[people]["gene"][x] /= sumGene
+        if sumTrait > 0:
+            for y in probabilities[people]["trait"]:
+                probabilities[people]["trait"][y] /= sumTrait
+
+
+def rescale(rows, factor):
+    """
+    Multiply every value in the list of lists `rows` by `factor`.
+    """
+    for row in rows:
+        for k in range(len(row)):
+            row[k] *= factor
+
+
+class Pedigree():
+    """
+    A family compiled for inference.
+
+    People are numbered so that parents come before their children, and
+    parents, traits and children are stored in lists indexed by number, so
+    that inference only needs lookups into `FACTORS`. Lists of genes have
+    one extra entry, NO_PARENT, which is the "parent" of every founder.
+    """
+
+    def __init__(self, people):
+        self.order = list(people)
+        self.names = topological_order(people)
+        self.ids = {name: i for i, name in enumerate(self.names)}
+
+        n = len(self.names)
+        self.mother = [
+            self.ids.get(people[name]["mother"], n) for name in self.names
+        ]
+        self.father = [
+            self.ids.get(people[name]["father"], n) for name in self.names
+        ]
+        self.trait = [
+            UNKNOWN if people[name]["trait"] is None
+            else int(people[name]["trait"])
+            for name in self.names
+        ]
+        self.children = [[] for _ in range(n)]
+        for i in range(n):
+            for parent in {self.mother[i], self.father[i]}:
+                if parent < n:
+                    self.children[parent].append(i)
+
+    def genes(self):
+        """
+        Return a list of genes with everyone set to 0.
+        """
+        return [0] * len(self.names) + [NO_PARENT]
+
+    def log_probability(self, genes, traits):
+        """
+        Return the log joint probability of `genes` and `traits`, where
+        traits may be UNKNOWN to leave them out.
+        """
+        table = FACTORS["log"]
+        return sum(
+            table[genes[m]][genes[f]][g][t]
+            for m, f, g, t in zip(self.mother, self.father, genes, traits)
+        )
+
+    def factor(self, genes, i):
+        """
+        Return the log factor of person `i` given `genes`.
+        """
+        m = genes[self.mother[i]]
+        f = genes[self.father[i]]
+        return FACTORS["log"][m][f][genes[i]][self.trait[i]]
+
+    def to_probabilities(self, rows):
+        """
+        Convert rows of [gene 0, gene 1, gene 2, no trait, trait] values,
+        indexed by person number, into a dictionary of distributions.
+        """
+        probabilities = empty_probabilities(self.order)
+        for name in self.order:
+            row = rows[self.ids[name]]
+            for g in range(3):
+                probabilities[name]["gene"][g] = row[g]
+            probabilities[name]["trait"][False] = row[3]
+            probabilities[name]["trait"][True] = row[4]
+        return probabilities
+
+
+def topological_order(people):
+    """
+    Return a list of people in which parents come before their children.
+    """
+    order = []
+    visited = set()
+
+    def visit(person):
+        if person in visited:
+            return
+        visited.add(person)
+        for parent in (people[person]["mother"], people[person]["father"]):
+            if parent is not None:
+                visit(parent)
+        order.append(person)
+
+    for person in people:
+        visit(person)
+    return order
+
+
+def sample_log_index(rng, log_weights):
+    """
+    Return an index into `log_weights`, chosen with probability
+    proportional to the exponential of its log weight.
+    """
+    top = max(log_weights)
+    return sample_index(rng, [math.exp(w - top) for w in log_weights])
+
+
+def sample_index(rng, weights):
+    """
+    Return an index into `weights`, chosen with probability proportional
+    to its weight.
+    """
+    r = rng.random() * sum(weights)
+    for i, w in enumerate(weights):
+        r -= w
+        if r < 0:
+            return i
+    return len(weights) - 1
+
+
+def likelihood_weighting(people, samples, target_error=None, seed=None,
+                         check_every=100,
+                         min_effective=MIN_EFFECTIVE_SAMPLES):
+    """
+    Estimate gene and trait distributions by likelihood weighting.
+
+    Genes and unobserved traits are sampled forward through the family,
+    and each sample is weighted by the probability of the observed traits.
+    Stop after `samples` samples, or earlier once every standard error is
+    at most `target_error` and the effective sample size, (sum w)^2 /
+    sum w^2, is at least `min_effective`. Errors are NaN while it is
+    smaller, since weights that have collapsed onto a few samples make the
+    standard errors look far smaller than they are.
+
+    Return (probabilities, errors, number of samples used, effective
+    sample size).
+    """
+    rng = random.Random(seed)
+    pedigree = Pedigree(people)
+    n = len(pedigree.names)
+    inherit = FACTORS["inherit"]
+    trait_probs = FACTORS["trait"]
+    log_trait = FACTORS["log_trait"]
+    parents = list(zip(pedigree.mother, pedigree.father, pedigree.trait))
+
+    # Weighted sums for each value, and the sums needed for standard errors,
+    # kept as multiples of exp(shift) so that tiny weights do not underflow
+    shift = -math.inf
+    sum_w = 0
+    sum_w2 = 0
+    sum_wx = [[0] * 5 for _ in range(n)]
+    sum_w2x = [[0] * 5 for _ in range(n)]
+
+    genes = pedigree.genes()
+    traits = [0] * n
+    count = 0
+    while count < samples:
+        count += 1
+        log_weight = 0
+        for i, (m, f, t) in enumerate(parents):
+            g = genes[i] = sample_index(rng, inherit[genes[m]][genes[f]])
+            if t == UNKNOWN:
+                traits[i] = int(rng.random() < trait_probs[g])
+            else:
+                traits[i] = t
+                log_weight += log_trait[g][t]
+
+        if log_weight > shift:
+            factor = math.exp(shift - log_weight)
+            sum_w *= factor
+            sum_w2 *= factor * factor
+            rescale(sum_wx, factor)
+            rescale(sum_w2x, factor * factor)
+            shift = log_weight
+        weight = math.exp(log_weight - shift)
+        weight2 = weight * weight
+        sum_w += weight
+        sum_w2 += weight2
+        for i in range(n):
+            sum_wx[i][genes[i]] += weight
+            sum_wx[i][3 + traits[i]] += weight
+            sum_w2x[i][genes[i]] += weight2
+            sum_w2x[i][3 + traits[i]] += weight2
+
+        if (target_error is not None and count % check_every == 0
+                and sum_w * sum_w >= min_effective * sum_w2):
+            _, errors = weighted_estimates(
+                pedigree, sum_w, sum_w2, sum_wx, sum_w2x
+            )
+            if max_error(errors) <= target_error:
+                break
+
+    probabilities, errors = weighted_estimates(
+        pedigree, sum_w, sum_w2, sum_wx, sum_w2x
+    )
+    effective = sum_w * sum_w / sum_w2 if sum_w2 else 0
+    if effective < min_effective:
+        errors = pedigree.to_probabilities([[math.nan] * 5] * n)
+    return probabilities, errors, count, effective
+
+
+def weighted_estimates(pedigree, sum_w, sum_w2, sum_wx, sum_w2x):
+    """
+    Return self-normalized estimates and their standard errors from the
+    weighted sums collected by likelihood weighting.
+    """
+    estimates = [[0] * 5 for _ in sum_wx]
+    errors = [[0] * 5 for _ in sum_wx]
+    if sum_w > 0:
+        for i in range(len(sum_wx)):
+            for k in range(5):
+                p = sum_wx[i][k] / sum_w
+
+                # Delta-method variance of a ratio estimator, using x^2 = x
+                var = (sum_w2x[i][k] * (1 - 2 * p)
+                       + p * p * sum_w2) / (sum_w * sum_w)
+                estimates[i][k] = p
+                errors[i][k] = math.sqrt(max(var, 0))
+    return (pedigree.to_probabilities(estimates),
+            pedigree.to_probabilities(errors))
+
+
+def gibbs_sampling(people, samples, target_error=None, seed=None,
+                   burn_in=None, batch_size=None):
+    """
+    Estimate gene and trait distributions by Gibbs sampling.
+
+    Each sweep resamples every person's genes given their Markov blanket
+    (parents, own trait and children), with unobserved traits summed out.
+    Standard errors are estimated from batch means, and sampling stops
+    early once every standard error is at most `target_error`. Errors are
+    NaN if too few sweeps were made to split them into two batches.
+
+    The effective sample size is the smallest over every gene value of
+    p(1 - p) / error^2, the number of independent samples that would give
+    the same standard error.
+
+    Return (probabilities, errors, number of sweeps used, effective
+    sample size).
+    """
+    rng = random.Random(seed)
+    pedigree = Pedigree(people)
+    n = len(pedigree.names)
+    inherit = FACTORS["inherit"]
+    trait_probs = FACTORS["trait"]
+    if burn_in is None:
+        burn_in = min(samples // 10, 1000)
+    if batch_size is None:
+        batch_size = max(samples // 50, 10)
+
+    # Start from a forward sample, which has nonzero probability since
+    # every factor is positive
+    genes = pedigree.genes()
+    for i in range(n):
+        genes[i] = sample_index(
+            rng, inherit[genes[pedigree.mother[i]]][genes[pedigree.father[i]]]
+        )
+
+    def sweep():
+        for i in range(n):
+            weights = [0, 0, 0]
+            for g in range(3):
+                genes[i] = g
+                weights[g] = pedigree.factor(genes, i) + sum(
+                    pedigree.factor(genes, c) for c in pedigree.children[i]
+                )
+            genes[i] = sample_log_index(rng, weights)
+
+    for _ in range(burn_in):
+        sweep()
+
+    # Sums over the current batch and over every finished batch, and
+    # running sums of batch means, and their squares, for each value
+    batch = [[0] * 5 for _ in range(n)]
+    totals = [[0] * 5 for _ in range(n)]
+    sum_means = [[0] * 5 for _ in range(n)]
+    sum_squares = [[0] * 5 for _ in range(n)]
+    batches = 0
+
+    count = 0
+    while count < samples:
+        sweep()
+        count += 1
+        for row, g, t in zip(batch, genes, pedigree.trait):
+            row[g] += 1
+            if t == UNKNOWN:
+                row[3] += 1 - trait_probs[g]
+                row[4] += trait_probs[g]
+            else:
+                row[3 + t] += 1
+
+        if count % batch_size == 0:
+            batches += 1
+            for i in range(n):
+                for k in range(5):
+                    mean = batch[i][k] / batch_size
+                    sum_means[i][k] += mean
+                    sum_squares[i][k] += mean * mean
+                    totals[i][k] += batch[i][k]
+                    batch[i][k] = 0
+            if target_error is not None and batches >= 10:
+                _, errors = batch_estimates(
+                    pedigree, sum_means, sum_squares, batches
+                )
+                if max_error(errors) <= target_error:
+                    break
+
+    # Estimate from every sweep, including any unfinished batch
+    for total, row in zip(totals, batch):
+        for k in range(5):
+            total[k] += row[k]
+    probabilities = pedigree.to_probabilities(totals)
+    normalize(probabilities)
+
+    # Errors are unknown if the run was too short to split into batches
+    if batches < 2:
+        errors = pedigree.to_probabilities([[math.nan] * 5] * n)
+        return probabilities, errors, count, math.nan
+    _, errors = batch_estimates(pedigree, sum_means, sum_squares, batches)
+    effective = min(
+        (p * (1 - p) / e ** 2
+         for person in probabilities
+         for p, e in zip(probabilities[person]["gene"].values(),
+                         errors[person]["gene"].values())
+         if e > 0),
+        default=count
+    )
+    return probabilities, errors, count, effective
+
+
+def batch_estimates(pedigree, sum_means, sum_squares, batches):
+    """
+    Return estimates and standard errors from sums of batch means.
+    """
+    estimates = [[0] * 5 for _ in sum_means]
+    errors = [[0] * 5 for _ in sum_means]
+    for i in range(len(sum_means)):
+        for k in range(5):
+            mean = sum_means[i][k] / batches
+            var = (sum_squares[i][k] / batches
+                   - mean * mean) * batches / (batches - 1)
+            estimates[i][k] = mean
+            errors[i][k] = math.sqrt(max(var, 0) / batches)
+    return (pedigree.to_probabilities(estimates),
+            pedigree.to_probabilities(errors))
+
+
+def max_error(errors):
+    """
+    Return the largest standard error over every person and value.
+    """
+    return max(
+        (e for person in errors for field in errors[person]
+         for e in errors[person][field].values()),
+        default=0
+    )
 
-            
 
 if __name__ == "__main__":
     main()
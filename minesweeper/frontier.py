@@ -0,0 +1,304 @@
+import math
+import time
+
+import numpy as np
+
+
+class Timeout(Exception):
+    """
+    Raised when counting configurations runs past its deadline.
+    """
+
+
+def components(sentences):
+    """
+    Split (cells, count) sentences into groups that share no cells.
+    Returns a list of (cells, sentences) pairs, one per group.
+    """
+    parent = dict()
+
+    def find(cell):
+        while parent[cell] != cell:
+            parent[cell] = parent[parent[cell]]
+            cell = parent[cell]
+        return cell
+
+    for cells, _ in sentences:
+        for cell in cells:
+            parent.setdefault(cell, cell)
+        cells = iter(cells)
+        root = find(next(cells))
+        for cell in cells:
+            other = find(cell)
+            if other != root:
+                parent[other] = root
+
+    groups = dict()
+    for cells, count in sentences:
+        group = groups.setdefault(find(next(iter(cells))), (set(), []))
+        group[0].update(cells)
+        group[1].append((cells, count))
+    return list(groups.values())
+
+
+def order_cells(cells, sentences):
+    """
+    Order the cells of one group breadth-first through the sentences that
+    contain them, so that sentences start and finish close together and
+    few are open at any point.
+    """
+    containing = dict()
+    for sentence in sentences:
+        for cell in sentence[0]:
+            containing.setdefault(cell, []).append(sentence)
+    start = min(cells)
+    order = [start]
+    seen = {start}
+    for cell in order:
+        for sentence in containing[cell]:
+            for other in sorted(set(sentence[0]) - seen):
+                seen.add(other)
+                order.append(other)
+    return order
+
+
+def add(p, q):
+    """
+    Return the sum of two polynomials, given as lists of coefficients.
+    """
+    if len(p) < len(q):
+        p, q = q, p
+    result = list(p)
+    for k, value in enumerate(q):
+        result[k] += value
+    return result
+
+
+def convolve(p, q, limit):
+    """
+    Return the product of two polynomials, dropping terms above `limit`.
+    """
+    result = [0] * min(len(p) + len(q) - 1, limit + 1)
+    for i, a in enumerate(p):
+        if not a:
+            continue
+        for j, b in enumerate(q[:len(result) - i]):
+            result[i + j] += a * b
+    return result
+
+
+def count_configurations(cells, sentences, limit, deadline=None):
+    """
+    Count the mine configurations of one group of cells that satisfy all
+    of its sentences and place at most `limit` mines.
+
+    Returns (totals, counts), where totals[k] is the number of those
+    configurations with k mines and counts[cell][k] the number of them that
+    also have a mine in `cell`.
+
+    Cells are assigned in order, and partial assignments that agree on
+    the mine counts of every sentence still open are merged, so the work
+    grows with the number of distinct such counts rather than with the
+    number of configurations. A forward pass counts the ways to reach
+    each merged state and a backward pass the ways to finish from it.
+    """
+    order = order_cells(cells, sentences)
+    n = len(order)
+    position = {cell: i for i, cell in enumerate(order)}
+
+    # For each sentence, its count and the positions of its cells
+    targets = [count for _, count in sentences]
+    positions = [sorted(position[cell] for cell in cells)
+                 for cells, _ in sentences]
+
+    # For each position, the sentences containing it, with how many of
+    # their cells come after it
+    touching = [[] for _ in range(n)]
+    for s, indices in enumerate(positions):
+        for k, i in enumerate(indices):
+            touching[i].append((s, len(indices) - k - 1))
+
+    # Sentences with cells both before and at or after each position
+    active = [[]]
+    for i in range(n):
+        active.append(
+            [s for s in active[i] if positions[s][-1] > i]
+            + [s for s, left in touching[i]
+               if positions[s][0] == i and left]
+        )
+
+    # Forward pass, remembering each state's transitions
+    alpha = [{(): [1]}]
+    transitions = []
+    for i in range(n):
+        layer = dict()
+        moves = dict()
+        for state, ways in alpha[i].items():
+            check(deadline)
+            moves[state] = []
+            sums = dict(zip(active[i], state))
+            for mine in (0, 1):
+                valid = True
+                updated = dict(sums)
+                for s, left in touching[i]:
+                    total = updated.get(s, 0) + mine
+                    if total > targets[s] or total + left < targets[s]:
+                        valid = False
+                        break
+                    updated[s] = total
+                if not valid:
+                    continue
+                after = tuple(updated[s] for s in active[i + 1])
+                moves[state].append((mine, after))
+                shifted = [0] * mine + ways
+                if len(shifted) > limit + 1:
+                    shifted = shifted[:limit + 1]
+                layer[after] = add(layer.get(after, []), shifted)
+        alpha.append(layer)
+        transitions.append(moves)
+
+    # Backward pass
+    beta = [None] * n + [{(): [1]}]
+    for i in range(n - 1, -1, -1):
+        layer = dict()
+        for state, moves in transitions[i].items():
+            check(deadline)
+            ways = []
+            for mine, after in moves:
+                if after in beta[i + 1]:
+                    shifted = [0] * mine + beta[i + 1][after]
+                    ways = add(ways, shifted[:limit + 1])
+            if ways:
+                layer[state] = ways
+        beta[i] = layer
+
+    totals = beta[0].get((), [])
+    counts = dict()
+    for i, cell in enumerate(order):
+        ways = []
+        for state, moves in transitions[i].items():
+            check(deadline)
+            for mine, after in moves:
+                if mine and after in beta[i + 1]:
+                    ways = add(ways, convolve(
+                        alpha[i][state], [0] + beta[i + 1][after], limit
+                    ))
+        counts[cell] = ways
+    return totals, counts
+
+
+def mine_probabilities(sentences, unknown, mines, deadline=None):
+    """
+    Return (probabilities, interior) for a board with `unknown` cells whose
+    contents are unknown, `mines` of which are mines.
+
+    `sentences` are (cells, count) pairs over unknown cells.
+    `probabilities` maps each cell in a sentence to the probability that
+    it is a mine, and `interior` is the probability for each other unknown
+    cell, or None if there are none.
+
+    Every arrangement of the mines consistent with the sentences is
+    equally likely. Each group of cells is counted separately. The groups'
+    counts are combined, weighted by the number of ways to place the
+    remaining mines in the interior.
+
+    Raises Timeout if `deadline` passes first.
+    """
+    groups = components(sentences)
+    frontier = sum(len(cells) for cells, _ in groups)
+    interior = unknown - frontier
+
+    # Count each group, scaling its counts to floats at most 1
+    results = []
+    for cells, group in groups:
+        totals, counts = count_configurations(cells, group, mines, deadline)
+        scale = max(totals, default=0)
+        if not scale:
+            raise ValueError("sentences are inconsistent")
+        results.append((
+            np.array([value / scale for value in totals]),
+            {cell: np.array([value / scale for value in ways])
+             for cell, ways in counts.items()}
+        ))
+
+    # Distributions of the mine count of the groups before each group
+    prefix = [np.ones(1)]
+    for totals, _ in results:
+        check(deadline)
+        prefix.append(rescale(np.convolve(prefix[-1], totals)))
+    combined = prefix.pop()
+
+    # Weight frontier mine counts by the ways to fill the interior
+    log_ways = np.array([
+        log_comb(interior, mines - j) if 0 <= mines - j <= interior
+        else -math.inf
+        for j in range(len(combined))
+    ])
+    shift = max(
+        (log_ways[j] for j, value in enumerate(combined) if value),
+        default=-math.inf
+    )
+    if shift == -math.inf:
+        raise ValueError("sentences are inconsistent with the mine count")
+    weights = np.exp(np.minimum(log_ways - shift, 700))
+
+    # Working backward, after[j] is the weight of the groups before a
+    # group placing j mines, summed over the counts of the groups after
+    # it; correlating it with the count of the groups before gives the
+    # weight of each count of the group itself, so no group needs the
+    # product of all the others
+    probabilities = dict()
+    after = weights
+    for (totals, counts), before in zip(reversed(results), reversed(prefix)):
+        check(deadline)
+        weight = np.correlate(after, before, "valid")
+        total = np.dot(totals, weight)
+        for cell, ways in counts.items():
+            probabilities[cell] = float(
+                np.dot(ways, weight[:len(ways)]) / total
+            )
+        after = rescale(np.correlate(after, totals, "valid"))
+
+    if interior <= 0:
+        return probabilities, None
+    total = np.dot(combined, weights)
+    expected = np.dot(combined * weights, mines - np.arange(len(combined)))
+    return probabilities, float(expected / total / interior)
+
+
+def local_probabilities(sentences, unknown, mines):
+    """
+    Return (probabilities, interior) like `mine_probabilities`, estimated
+    cheaply: each frontier cell gets the highest mine density of the
+    sentences containing it, and each other cell the overall density.
+    """
+    probabilities = dict()
+    for cells, count in sentences:
+        density = count / len(cells)
+        for cell in cells:
+            probabilities[cell] = max(probabilities.get(cell, 0), density)
+    interior = mines / unknown if unknown > len(probabilities) else None
+    return probabilities, interior
+
+
+def rescale(p):
+    """
+    Return an array divided by its largest value.
+    """
+    scale = p.max(initial=0)
+    return p / scale if scale else p
+
+
+def check(deadline):
+    """
+    Raise Timeout if `deadline` has passed.
+    """
+    if deadline is not None and time.perf_counter() > deadline:
+        raise Timeout
+
+
+def log_comb(n, k):
+    """
+    Return the natural log of n choose k.
+    """
+    return math.lgamma(n + 1) - math.lgamma(k + 1) - math.lgamma(n - k + 1)
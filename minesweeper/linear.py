@@ -0,0 +1,181 @@
+from collections import deque
+import math
+
+
+class LinearSystem():
+    """
+    Linear equations over cells that are each 0 (safe) or 1 (mine),
+    kept in reduced row echelon form as equations are added and cells
+    become known.
+
+    Each row is a [coefficients, total] pair, where coefficients maps cells
+    to nonzero integers, and is filed under its pivot: a cell that appears
+    in no other row. Whenever a row changes, it is checked against the
+    bounds its cells' values allow, and each cell whose value it forces
+    is queued in `self.forced` as a (cell, mine) pair.
+    """
+
+    def __init__(self):
+
+        # Rows by pivot, and the pivots of the rows containing each cell
+        self.rows = dict()
+        self.columns = dict()
+
+        # Values of cells already substituted into the system
+        self.known = dict()
+
+        # Forced cells that have not been assigned yet
+        self.forced = deque()
+        self.queued = set()
+
+    def add(self, cells, count):
+        """
+        Adds the equation that `count` of `cells` are mines.
+        """
+        coefficients = dict()
+        total = count
+        for cell in cells:
+            if cell in self.known:
+                total -= self.known[cell]
+            else:
+                coefficients[cell] = 1
+
+        # Eliminate existing pivots; their rows contain no other pivot
+        for pivot in [cell for cell in coefficients if cell in self.rows]:
+            coefficients, total = eliminate(
+                coefficients, total, self.rows[pivot], pivot
+            )
+        coefficients, total = normalize(coefficients, total)
+        if coefficients:
+            self.insert(coefficients, total)
+
+    def insert(self, coefficients, total):
+        """
+        Adds a row that contains no pivot, choosing as its pivot the cell
+        that is in the fewest other rows and eliminating it from them.
+        """
+        pivot = min(
+            coefficients, key=lambda cell: len(self.columns.get(cell, ()))
+        )
+        row = [coefficients, total]
+        for other in list(self.columns.get(pivot, ())):
+            self.replace(other, *eliminate(*self.rows[other], row, pivot))
+        self.rows[pivot] = row
+        for cell in coefficients:
+            self.columns.setdefault(cell, set()).add(pivot)
+        self.check(row)
+
+    def replace(self, pivot, coefficients, total):
+        """
+        Replaces the coefficients and total of the row filed under `pivot`,
+        which keeps its pivot, and checks it.
+        """
+        coefficients, total = normalize(coefficients, total)
+        row = self.rows[pivot]
+        for cell in row[0]:
+            if cell not in coefficients:
+                self.discard(cell, pivot)
+        for cell in coefficients:
+            if cell not in row[0]:
+                self.columns.setdefault(cell, set()).add(pivot)
+        row[0], row[1] = coefficients, total
+        self.check(row)
+
+    def discard(self, cell, pivot):
+        """
+        Records that the row filed under `pivot` no longer contains `cell`.
+        """
+        pivots = self.columns.get(cell)
+        if pivots is not None:
+            pivots.discard(pivot)
+            if not pivots:
+                del self.columns[cell]
+
+    def assign(self, cell, mine):
+        """
+        Substitutes a cell's value into every row that contains it.
+        """
+        if cell in self.known:
+            return
+        value = 1 if mine else 0
+        self.known[cell] = value
+        self.queued.discard(cell)
+        for pivot in self.columns.pop(cell, ()):
+            coefficients, total = self.rows[pivot]
+            total -= coefficients[cell] * value
+            coefficients = {
+                other: coefficient
+                for other, coefficient in coefficients.items()
+                if other != cell
+            }
+            if pivot != cell:
+                self.replace(pivot, coefficients, total)
+                continue
+
+            # The row lost its pivot, so file it again under a new one
+            del self.rows[pivot]
+            for other in coefficients:
+                self.discard(other, pivot)
+            coefficients, total = normalize(coefficients, total)
+            if coefficients:
+                self.insert(coefficients, total)
+
+    def check(self, row):
+        """
+        Queues the cells of a row that its bounds force to be mines or
+        safe.
+
+        A cell is forced when its coefficient is larger than the slack
+        between the row's total and the bound it would move the row
+        towards: setting it the other way would put the total out of
+        reach. A row at either bound forces every cell in it.
+        """
+        coefficients, total = row
+        low = sum(value for value in coefficients.values() if value < 0)
+        high = sum(value for value in coefficients.values() if value > 0)
+        for cell, value in coefficients.items():
+            if cell in self.queued:
+                continue
+            if value > 0:
+                mine = value > high - total
+                safe = value > total - low
+            else:
+                mine = -value > total - low
+                safe = -value > high - total
+            if mine or safe:
+                self.queued.add(cell)
+                self.forced.append((cell, mine))
+
+
+def eliminate(coefficients, total, row, pivot):
+    """
+    Returns (coefficients, total) with `pivot` eliminated using `row`.
+    """
+    a = coefficients[pivot]
+    b = row[0][pivot]
+    result = {cell: value * b for cell, value in coefficients.items()}
+    for cell, value in row[0].items():
+        value = result.get(cell, 0) - value * a
+        if value:
+            result[cell] = value
+        else:
+            result.pop(cell, None)
+    return result, total * b - row[1] * a
+
+
+def normalize(coefficients, total):
+    """
+    Returns (coefficients, total) divided by the greatest common divisor
+    of the coefficients, with the first coefficient positive.
+    """
+    if not coefficients:
+        return coefficients, total
+    divisor = math.gcd(*coefficients.values())
+    if next(iter(coefficients.values())) < 0:
+        divisor = -divisor
+    if divisor == 1 or total % divisor:
+        return coefficients, total
+    return (
+        {cell: value // divisor for cell, value in coefficients.items()},
+        total // divisor
+    )
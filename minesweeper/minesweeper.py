@@ -1,6 +1,27 @@
-from copy import deepcopy
+from collections import deque
 import itertools
+import math
 import random
+import time
+
+import numpy as np
+
+import frontier
+import linear
+
+# Offsets from a cell to its eight neighbors
+NEIGHBORS = [
+    (di, dj) for di in (-1, 0, 1) for dj in (-1, 0, 1) if (di, dj) != (0, 0)
+]
+
+# Mine probabilities closer than this count as equal
+EPSILON = 1e-9
+
+# Statistics kept by MinesweeperAI.add_knowledge
+STATS = [
+    "calls", "sentences", "duplicates", "subset_checks", "safes_inferred",
+    "mines_inferred", "linear_inferred", "seconds"
+]
 
 
 class Minesweeper():
@@ -13,27 +34,45 @@ class Minesweeper():
         # Set initial width, height, and number of mines
         self.height = height
         self.width = width
-        self.mines = set()
-
-        # Initialize an empty field with no mines
-        self.board = []
-        for i in range(self.height):
-            row = []
-            for j in range(self.width):
-                row.append(False)
-            self.board.append(row)
-
-        # Add mines randomly
-        while len(self.mines) != mines:
-            i = random.randrange(height)
-            j = random.randrange(width)
-            if not self.board[i][j]:
-                self.mines.add((i, j))
-                self.board[i][j] = True
+        self.mine_count = mines
+
+        # Add mines randomly, seeding NumPy from `random` so that seeding
+        # `random` fixes the board
+        rng = np.random.default_rng(random.getrandbits(64))
+        self.board = place(rng, height * width, mines).reshape(height, width)
+
+        # Count every cell's neighboring mines once, by summing the eight
+        # shifted copies of the board. Counts and revealed cells are kept
+        # inside a border of cells that `reveal` never spreads into
+        padded = np.pad(self.board, 1).view(np.uint8)
+        self._counts = np.full((height + 2, width + 2), 255, dtype=np.uint8)
+        self.counts = self._counts[1:-1, 1:-1]
+        self.counts[:] = 0
+        for di, dj in NEIGHBORS:
+            self.counts += padded[
+                1 + di:1 + di + height, 1 + dj:1 + dj + width
+            ]
+
+        # Cells revealed by `reveal`
+        self._revealed = np.ones((height + 2, width + 2), dtype=bool)
+        self.revealed = self._revealed[1:-1, 1:-1]
+        self.revealed[:] = False
+
+        # The set of mines, built only if asked for
+        self._mines = None
 
         # At first, player has found no mines
         self.mines_found = set()
 
+    @property
+    def mines(self):
+        """
+        The set of cells that are mines.
+        """
+        if self._mines is None:
+            self._mines = set(map(tuple, np.argwhere(self.board).tolist()))
+        return self._mines
+
     def print(self):
         """
         Prints a text-based representation
@@ -42,7 +81,7 @@ class Minesweeper():
         for i in range(self.height):
             print("--" * self.width + "-")
             for j in range(self.width):
-                if self.board[i][j]:
+                if self.board[i, j]:
                     print("|X", end="")
                 else:
                     print("| ", end="")
@@ -51,7 +90,7 @@ class Minesweeper():
 
     def is_mine(self, cell):
         i, j = cell
-        return self.board[i][j]
+        return bool(self.board[i, j])
 
     def nearby_mines(self, cell):
         """
@@ -59,31 +98,71 @@ class Minesweeper():
         within one row and column of a given cell,
         not including the cell itself.
         """
+        i, j = cell
+        return int(self.counts[i, j])
 
-        # Keep count of nearby mines
-        count = 0
-
-        # Loop over all cells within one row and column
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
-
-                # Ignore the cell itself
-                if (i, j) == cell:
-                    continue
-
-                # Update count if cell in bounds and is mine
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    if self.board[i][j]:
-                        count += 1
-
+    def reveal(self, cell):
+        """
+        Reveals a cell and, if it is safe with no nearby mines, every cell
+        reachable from it through safe cells with no nearby mines, as
+        in the usual game.
 
-        return count
+        Returns a (k, 2) array of the (i, j) cells newly revealed. The
+        fill spreads a whole wave of cells at a time.
+        """
+        i, j = cell
+        if self.revealed[i, j]:
+            return np.empty((0, 2), dtype=np.intp)
+        self.revealed[i, j] = True
+        if self.board[i, j]:
+            return np.array([[i, j]], dtype=np.intp)
+
+        # Work with flat indices into the bordered arrays
+        stride = self.width + 2
+        counts = self._counts.reshape(-1)
+        revealed = self._revealed.reshape(-1)
+        offsets = np.array([di * stride + dj for di, dj in NEIGHBORS])
+        wave = np.array([(i + 1) * stride + j + 1])
+        opened = [wave]
+        while len(wave):
+
+            # Unrevealed neighbors of the cells in this wave with no
+            # nearby mines
+            wave = wave[counts[wave] == 0]
+            cells = (wave[:, None] + offsets).reshape(-1)
+            wave = np.unique(cells[~revealed[cells]])
+            revealed[wave] = True
+            opened.append(wave)
+        rows, columns = np.divmod(np.concatenate(opened), stride)
+        return np.stack([rows - 1, columns - 1], axis=1)
 
     def won(self):
         """
         Checks if all mines have been flagged.
         """
-        return self.mines_found == self.mines
+        return (
+            len(self.mines_found) == self.mine_count
+            and all(self.board[i, j] for i, j in self.mines_found)
+        )
+
+
+def place(rng, size, count):
+    """
+    Returns a flat boolean field of `size` cells with `count` of them,
+    chosen uniformly at random, set.
+
+    Cells are drawn with replacement, drawing again for however many
+    repeats there were, which stays fast on huge fields. Fields more than
+    half full are made by choosing the cells to leave clear.
+    """
+    if count > size // 2:
+        return ~place(rng, size, size - count)
+    field = np.zeros(size, dtype=bool)
+    placed = 0
+    while placed < count:
+        field[rng.integers(size, size=count - placed)] = True
+        placed = np.count_nonzero(field)
+    return field
 
 
 class Sentence():
@@ -91,17 +170,41 @@ class Sentence():
     Logical statement about a Minesweeper game
     A sentence consists of a set of board cells,
     and a count of the number of those cells which are mines.
+
+    The cells are kept as a sorted tuple, which takes far less memory
+    than a set for the few cells a sentence has and doubles as a
+    canonical form.
+
+    Sentences change as cells are marked, so they compare and hash by
+    identity; compare their `key()`s to tell whether two are equal.
     """
 
+    __slots__ = ("cells", "count")
+
     def __init__(self, cells, count):
-        self.cells = set(cells)
+        self.cells = tuple(sorted(cells))
         self.count = count
 
-    def __eq__(self, other):
-        return self.cells == other.cells and self.count == other.count
-
     def __str__(self):
-        return f"{self.cells} = {self.count}"
+        return f"{set(self.cells)} = {self.count}"
+
+    def key(self):
+        """
+        Returns a hashable key that is equal for equal sentences.
+        """
+        return self.cells, self.count
+
+    def issubset(self, other):
+        """
+        Returns whether every cell in this sentence is in `other`.
+        """
+        return all(cell in other.cells for cell in self.cells)
+
+    def difference(self, other):
+        """
+        Returns the cells in this sentence that are not in `other`.
+        """
+        return [cell for cell in self.cells if cell not in other.cells]
 
     def known_mines(self):
         """
@@ -109,9 +212,9 @@ class Sentence():
         """
         # If the number of cells equal to the mine count, they are all mines
         if self.count == len(self.cells) and self.count > 0:
-            return self.cells
+            return set(self.cells)
 
-        return set()         
+        return set()
 
 
     def known_safes(self):
@@ -119,7 +222,7 @@ class Sentence():
         Returns the set of all cells in self.cells known to be safe.
         """
         if self.count == 0: # A cell can only be safe if there are 0 count of mines.
-            return self.cells
+            return set(self.cells)
 
         return set()
 
@@ -130,9 +233,7 @@ class Sentence():
         """
         if cell in self.cells:
             self.count -= 1
-            self.cells.remove(cell)
-        else:
-            pass
+            self.cells = tuple(other for other in self.cells if other != cell)
 
     def mark_safe(self, cell):
         """
@@ -140,9 +241,7 @@ class Sentence():
         a cell is known to be safe.
         """
         if cell in self.cells:
-            self.cells.remove(cell)
-        else:
-            pass
+            self.cells = tuple(other for other in self.cells if other != cell)
 
 
 class MinesweeperAI():
@@ -150,12 +249,22 @@ class MinesweeperAI():
     Minesweeper game player
     """
 
-    def __init__(self, height=8, width=8):
+    def __init__(self, height=8, width=8, mines=None, time_budget=0.1,
+                 inference="subset"):
 
         # Set initial height and width
         self.height = height
         self.width = width
 
+        # Total number of mines on the board, if known, and the seconds
+        # to spend working out the safest guess
+        self.total_mines = mines
+        self.time_budget = time_budget
+
+        # With "linear" inference, sentences are also kept as a linear
+        # system, whose bounds force cells that subsets alone miss
+        self.linear = linear.LinearSystem() if inference == "linear" else None
+
         # Keep track of which cells have been clicked on
         self.moves_made = set()
 
@@ -163,26 +272,190 @@ class MinesweeperAI():
         self.mines = set()
         self.safes = set()
 
-        # List of sentences about the game known to be true
-        self.knowledge = []
+        # Safe cells that may not have been chosen yet, in the order they
+        # were found
+        self.pending = deque()
+
+        # IDs of the cells not chosen and not known to be mines, and the
+        # position of each ID in that list (-1 once removed), so that cells
+        # can be removed and chosen at random in constant time
+        self.unexplored = list(range(height * width))
+        self.positions = self.unexplored[:]
+
+        # Set of sentences about the game known to be true
+        self.knowledge = set()
+
+        # Map from each cell's ID to the sentences that contain it, and
+        # from each sentence's canonical key to the sentence. Sentences,
+        # and the linear system, hold cell IDs rather than (i, j) cells
+        self.index = dict()
+        self.canonical = dict()
+
+        # Sentences whose inferences have not been drawn yet
+        self.worklist = deque()
+        self.queued = set()
+
+        # Inference statistics, over all calls to add_knowledge and for
+        # the most recent one
+        self.stats = dict.fromkeys(STATS, 0)
+        self.last_stats = dict.fromkeys(STATS, 0)
+
+    def cell_id(self, cell):
+        """
+        Returns the integer ID of an (i, j) cell.
+        """
+        i, j = cell
+        return i * self.width + j
+
+    def cell_at(self, index):
+        """
+        Returns the (i, j) cell with a given integer ID.
+        """
+        return divmod(index, self.width)
+
+    def explore(self, index):
+        """
+        Removes a cell's ID from the unexplored cells, if it is there.
+        """
+        position = self.positions[index]
+        if position < 0:
+            return
+        last = self.unexplored.pop()
+        if last != index:
+            self.unexplored[position] = last
+            self.positions[last] = position
+        self.positions[index] = -1
+
+    def queue(self, sentence):
+        """
+        Queues a sentence for inference, unless it is already queued.
+        """
+        if sentence not in self.queued:
+            self.queued.add(sentence)
+            self.worklist.append(sentence)
+
+    def add_sentence(self, sentence):
+        """
+        Adds a sentence to the knowledge base and queues it for inference,
+        unless it has no cells or an equal sentence is already known.
+        Returns whether it was added.
+        """
+        if not sentence.cells:
+            return False
+        key = sentence.key()
+        if key in self.canonical:
+            self.last_stats["duplicates"] += 1
+            return False
+        self.canonical[key] = sentence
+        self.knowledge.add(sentence)
+        for cell in sentence.cells:
+            self.index.setdefault(cell, set()).add(sentence)
+        self.last_stats["sentences"] += 1
+        self.queue(sentence)
+        return True
+
+    def remove_sentence(self, sentence):
+        """
+        Removes a sentence, which is not in `self.canonical`, from the
+        knowledge base.
+        """
+        self.knowledge.discard(sentence)
+        for cell in sentence.cells:
+            sentences = self.index[cell]
+            sentences.discard(sentence)
+            if not sentences:
+                del self.index[cell]
+
+    def refile(self, sentence):
+        """
+        Files a sentence that has just changed under its new canonical
+        key and queues it for inference, or removes it if it has no cells
+        left or has become equal to another known sentence.
+        """
+        key = sentence.key()
+        if not sentence.cells or key in self.canonical:
+            self.remove_sentence(sentence)
+        else:
+            self.canonical[key] = sentence
+            self.queue(sentence)
 
     def mark_mine(self, cell):
         """
-        Marks a cell as a mine, and updates all knowledge
-        to mark that cell as a mine as well.
+        Marks a cell as a mine, and updates the sentences that contain
+        that cell to mark it as a mine as well.
         """
         self.mines.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_mine(cell)
+        index = self.cell_id(cell)
+        self.explore(index)
+        if self.linear is not None:
+            self.linear.assign(index, True)
+        for sentence in self.index.pop(index, ()):
+            del self.canonical[sentence.key()]
+            sentence.mark_mine(index)
+            self.refile(sentence)
 
     def mark_safe(self, cell):
         """
-        Marks a cell as safe, and updates all knowledge
-        to mark that cell as safe as well.
+        Marks a cell as safe, and updates the sentences that contain
+        that cell to mark it as safe as well.
         """
+        if cell not in self.safes and cell not in self.moves_made:
+            self.pending.append(cell)
         self.safes.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_safe(cell)
+        index = self.cell_id(cell)
+        if self.linear is not None:
+            self.linear.assign(index, False)
+        for sentence in self.index.pop(index, ()):
+            del self.canonical[sentence.key()]
+            sentence.mark_safe(index)
+            self.refile(sentence)
+
+    def infer(self):
+        """
+        Draws inferences from queued sentences until none are left, so
+        the knowledge base reaches a fixpoint.
+
+        A sentence whose cells are all mines or all safe has them marked,
+        which queues every sentence containing them. Otherwise it is
+        compared with the sentences that share a cell with it: whenever
+        one's cells are a proper subset of the other's, their difference
+        is added as a new sentence.
+        """
+        while self.worklist:
+            sentence = self.worklist.popleft()
+            self.queued.discard(sentence)
+            if sentence not in self.knowledge:
+                continue
+
+            safes = sentence.known_safes()
+            mines = sentence.known_mines()
+            for index in safes:
+                self.mark_safe(self.cell_at(index))
+            for index in mines:
+                self.mark_mine(self.cell_at(index))
+            self.last_stats["safes_inferred"] += len(safes)
+            self.last_stats["mines_inferred"] += len(mines)
+            if safes or mines:
+                continue
+
+            others = set()
+            for index in sentence.cells:
+                others |= self.index[index]
+            others.discard(sentence)
+            for other in others:
+                self.last_stats["subset_checks"] += 1
+                if (len(sentence.cells) < len(other.cells)
+                        and sentence.issubset(other)):
+                    self.add_sentence(Sentence(
+                        other.difference(sentence),
+                        other.count - sentence.count
+                    ))
+                elif (len(other.cells) < len(sentence.cells)
+                        and other.issubset(sentence)):
+                    self.add_sentence(Sentence(
+                        sentence.difference(other),
+                        sentence.count - other.count
+                    ))
 
     def add_knowledge(self, cell, count):
         """
@@ -198,9 +471,15 @@ class MinesweeperAI():
                if it can be concluded based on the AI's knowledge base
             5) add any new sentences to the AI's knowledge base
                if they can be inferred from existing knowledge
+
+        Statistics for the call are left in `self.last_stats`, and added
+        to `self.stats`.
         """
+        start = time.perf_counter()
+        self.last_stats = dict.fromkeys(STATS, 0)
 
         self.moves_made.add(cell) # mark the cell as a move that has been made
+        self.explore(self.cell_id(cell))
         self.mark_safe(cell) # mark the cell as safe
         
         neighbors = set() # Create a set to store undefined cell 
@@ -226,44 +505,29 @@ class MinesweeperAI():
                     if (i,j) not in self.moves_made and (i,j) not in self.safes and (i,j) not in self.mines:
                         neighbors.add((i,j))
 
-        if len(neighbors) > 0:
-            self.knowledge.append(Sentence(neighbors, count)) # Adding new sentences to the knowledge base
-
-        # A loop that checkes through the sentences in knowledge to see whether the cells are mines or safes
-        for sentences in self.knowledge:
-            if sentences.count == 0:  # If the mine count is 0, then all of the cells are safe
-                copyCells = deepcopy(sentences.cells) # Make sures any changes to the board cells copy do not influence the original set 
-                for cells in copyCells:
-                    self.mark_safe(cells)
-            elif sentences.count == len(sentences.cells): # Likewise, they are mines if the count is equal to the length of the cells
-                copyCells = deepcopy(sentences.cells)
-                for cells in copyCells:
-                    self.mark_mine(cells)
-
-        # Also checkes if some sentences are subsets of others
-        for sentence1 in self.knowledge:
-
-            for sentence2 in self.knowledge:
-                if sentence1.count == sentence2.count: # Skip if the sentences are the same
-                    continue
-
-                if len(sentence1.cells) != 0 and len(sentence2.cells)!=0: # An empty set needs to be rule out since it is a subset of every set
-
-                    if sentence1.cells.issubset(sentence2.cells): 
-                        combinedCells = sentence1.cells-sentence2.cells
-                        combinedCounts = sentence1.count-sentence2.count # Draw new inferences into the KB by subtracting
-
-                        if Sentence(combinedCells,combinedCounts) not in self.knowledge: # Don't repeat the sentences
-                            self.knowledge.append(Sentence(combinedCells, combinedCounts)) # Construct a new sentence
-                
-                    elif sentence2.cells.issubset(sentence1.cells): 
-                        combinedCells = sentence2.cells-sentence1.cells
-                        combinedCounts = sentence2.count-sentence1.count
-
-                        if Sentence(combinedCells,combinedCounts) not in self.knowledge:
-                            self.knowledge.append(Sentence(combinedCells, combinedCounts))
-        
-            
+        cells = [self.cell_id(neighbor) for neighbor in neighbors]
+        self.add_sentence(Sentence(cells, count)) # Adding new sentences to the knowledge base
+
+        # Draw every inference that follows from the new sentence
+        if self.linear is not None:
+            self.linear.add(cells, count)
+        self.infer()
+        while self.linear is not None and self.linear.forced:
+            index, mine = self.linear.forced.popleft()
+            cell = self.cell_at(index)
+            if cell in self.mines or cell in self.safes:
+                continue
+            self.last_stats["linear_inferred"] += 1
+            if mine:
+                self.mark_mine(cell)
+            else:
+                self.mark_safe(cell)
+            self.infer()
+
+        self.last_stats["calls"] = 1
+        self.last_stats["seconds"] = time.perf_counter() - start
+        for name, value in self.last_stats.items():
+            self.stats[name] += value
 
     def make_safe_move(self):
         """
@@ -275,12 +539,10 @@ class MinesweeperAI():
         and self.moves_made, but should not modify any of those values.
         """
 
-        for safeMoves in self.safes:
-            if safeMoves not in self.moves_made and safeMoves not in self.mines:
-                return safeMoves # Return a safe cell
-        
-        return None
-
+        # Drop pending cells that have been chosen since they were found
+        while self.pending and self.pending[0] in self.moves_made:
+            self.pending.popleft()
+        return self.pending[0] if self.pending else None
 
     def make_random_move(self):
         """
@@ -288,10 +550,64 @@ class MinesweeperAI():
         Should choose randomly among cells that:
             1) have not already been chosen, and
             2) are not known to be mines
+
+        If the total number of mines is known, chooses randomly among the
+        cells least likely to be mines instead.
         """
-        for i in range(self.height): 
-            for j in range(self.width):
-                if (i,j) not in self.moves_made and (i,j) not in self.mines:
-                        return (i,j)
-        
-        return None
+        if not self.unexplored:
+            return None
+        if self.total_mines is None:
+            return self.cell_at(random.choice(self.unexplored))
+        return self.cell_at(self.least_risky())
+
+    def least_risky(self):
+        """
+        Returns the ID of a cell chosen randomly among the unexplored cells
+        least likely to be mines.
+
+        Mine probabilities are counted exactly by `frontier`, unless that
+        takes longer than `self.time_budget` seconds, in which case they
+        are estimated from sentence densities.
+        """
+        sentences = [
+            (sentence.cells, sentence.count) for sentence in self.knowledge
+        ]
+        unknown = len(self.unexplored)
+        mines = self.total_mines - len(self.mines)
+        deadline = time.perf_counter() + self.time_budget
+        try:
+            probabilities, interior = frontier.mine_probabilities(
+                sentences, unknown, mines, deadline
+            )
+        except frontier.Timeout:
+            probabilities, interior = frontier.local_probabilities(
+                sentences, unknown, mines
+            )
+
+        # Cells in no sentence share the interior probability, so choose
+        # among them as a group, in proportion to their number
+        lowest = min(probabilities.values(), default=math.inf)
+        choices = [
+            index for index, probability in probabilities.items()
+            if probability <= lowest + EPSILON
+        ]
+        outside = unknown - len(probabilities)
+        if interior is not None and interior <= lowest + EPSILON and (
+            interior < lowest - EPSILON
+            or random.randrange(len(choices) + outside) >= len(choices)
+        ):
+            return self.random_interior(probabilities)
+        return random.choice(choices)
+
+    def random_interior(self, frontier):
+        """
+        Returns the ID of an unexplored cell chosen uniformly at random
+        among those not in `frontier`, which must not hold them all.
+        """
+        for _ in range(64):
+            index = random.choice(self.unexplored)
+            if index not in frontier:
+                return index
+        return random.choice(
+            [index for index in self.unexplored if index not in frontier]
+        )
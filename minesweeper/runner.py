@@ -1,6 +1,5 @@
 import pygame
 import sys
-import time
 
 from minesweeper import Minesweeper, MinesweeperAI
 
@@ -8,6 +7,9 @@ HEIGHT = 8
 WIDTH = 8
 MINES = 8
 
+# Frames per second to redraw at most
+FPS = 30
+
 # Colors
 BLACK = (0, 0, 0)
 GRAY = (180, 180, 180)
@@ -17,6 +19,7 @@ WHITE = (255, 255, 255)
 pygame.init()
 size = width, height = 600, 400
 screen = pygame.display.set_mode(size)
+clock = pygame.time.Clock()
 
 # Fonts
 OPEN_SANS = "assets/fonts/OpenSans-Regular.ttf"
@@ -37,9 +40,51 @@ flag = pygame.transform.scale(flag, (cell_size, cell_size))
 mine = pygame.image.load("assets/images/mine.png")
 mine = pygame.transform.scale(mine, (cell_size, cell_size))
 
+# Render every piece of text once
+numbers = [smallFont.render(str(n), True, BLACK) for n in range(9)]
+statuses = {
+    text: mediumFont.render(text, True, WHITE) for text in ["", "Lost", "Won"]
+}
+playText = mediumFont.render("Play Game", True, BLACK)
+aiText = mediumFont.render("AI Move", True, BLACK)
+resetText = mediumFont.render("Reset", True, BLACK)
+title = largeFont.render("Play Minesweeper", True, WHITE)
+rules = [
+    smallFont.render(rule, True, WHITE) for rule in [
+        "Click a cell to reveal it.",
+        "Right-click a cell to mark it as a mine.",
+        "Mark all mines successfully to win!"
+    ]
+]
+
+# Lay out the screen
+cells = [
+    [
+        pygame.Rect(
+            board_origin[0] + j * cell_size,
+            board_origin[1] + i * cell_size,
+            cell_size, cell_size
+        )
+        for j in range(WIDTH)
+    ]
+    for i in range(HEIGHT)
+]
+playButton = pygame.Rect((width / 4), (3 / 4) * height, width / 2, 50)
+aiButton = pygame.Rect(
+    (2 / 3) * width + BOARD_PADDING, (1 / 3) * height - 50,
+    (width / 3) - BOARD_PADDING * 2, 50
+)
+resetButton = pygame.Rect(
+    (2 / 3) * width + BOARD_PADDING, (1 / 3) * height + 20,
+    (width / 3) - BOARD_PADDING * 2, 50
+)
+statusRect = pygame.Rect(
+    (2 / 3) * width, (2 / 3) * height - 30, width / 3, 60
+)
+
 # Create game and AI agent
 game = Minesweeper(height=HEIGHT, width=WIDTH, mines=MINES)
-ai = MinesweeperAI(height=HEIGHT, width=WIDTH)
+ai = MinesweeperAI(height=HEIGHT, width=WIDTH, mines=MINES)
 
 # Keep track of revealed cells, flagged cells, and if a mine was hit
 revealed = set()
@@ -49,174 +94,178 @@ lost = False
 # Show instructions initially
 instructions = True
 
+# Status message on screen, whether the whole screen must be redrawn,
+# and which cells must be
+status = ""
+full = True
+dirty = set()
+
+
+def blit_centered(surface, center):
+    rect = surface.get_rect()
+    rect.center = center
+    screen.blit(surface, rect)
+
+
+def draw_button(rect, text):
+    pygame.draw.rect(screen, WHITE, rect)
+    blit_centered(text, rect.center)
+
+
+def draw_instructions():
+    screen.fill(BLACK)
+    blit_centered(title, ((width / 2), 50))
+    for i, line in enumerate(rules):
+        blit_centered(line, ((width / 2), 150 + 30 * i))
+    draw_button(playButton, playText)
+
+
+def draw_cell(i, j):
+    """
+    Draw one cell, returning the area of the screen it covers.
+    """
+    rect = cells[i][j]
+    pygame.draw.rect(screen, GRAY, rect)
+    pygame.draw.rect(screen, WHITE, rect, 3)
+
+    # Add a mine, flag, or number if needed
+    if game.is_mine((i, j)) and lost:
+        screen.blit(mine, rect)
+    elif (i, j) in flags:
+        screen.blit(flag, rect)
+    elif (i, j) in revealed:
+        blit_centered(numbers[game.nearby_mines((i, j))], rect.center)
+    return rect
+
+
+def draw_status():
+    """
+    Draw the won or lost message, returning the area of the screen it
+    covers.
+    """
+    pygame.draw.rect(screen, BLACK, statusRect)
+    blit_centered(statuses[status], ((5 / 6) * width, (2 / 3) * height))
+    return statusRect
+
+
+def draw_game():
+    screen.fill(BLACK)
+    for i in range(HEIGHT):
+        for j in range(WIDTH):
+            draw_cell(i, j)
+    draw_button(aiButton, aiText)
+    draw_button(resetButton, resetText)
+    draw_status()
+
+
+def cell_at(position):
+    """
+    Return the cell at a screen position, or None if it is off the board.
+    """
+    x, y = position
+    i = (y - board_origin[1]) // cell_size
+    j = (x - board_origin[0]) // cell_size
+    if 0 <= i < HEIGHT and 0 <= j < WIDTH:
+        return (int(i), int(j))
+    return None
+
+
 while True:
+    clock.tick(FPS)
 
-    # Check if game quit
+    # Handle input
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
             sys.exit()
 
-    screen.fill(BLACK)
-
-    # Show game instructions
-    if instructions:
-
-        # Title
-        title = largeFont.render("Play Minesweeper", True, WHITE)
-        titleRect = title.get_rect()
-        titleRect.center = ((width / 2), 50)
-        screen.blit(title, titleRect)
-
-        # Rules
-        rules = [
-            "Click a cell to reveal it.",
-            "Right-click a cell to mark it as a mine.",
-            "Mark all mines successfully to win!"
-        ]
-        for i, rule in enumerate(rules):
-            line = smallFont.render(rule, True, WHITE)
-            lineRect = line.get_rect()
-            lineRect.center = ((width / 2), 150 + 30 * i)
-            screen.blit(line, lineRect)
-
-        # Play game button
-        buttonRect = pygame.Rect((width / 4), (3 / 4) * height, width / 2, 50)
-        buttonText = mediumFont.render("Play Game", True, BLACK)
-        buttonTextRect = buttonText.get_rect()
-        buttonTextRect.center = buttonRect.center
-        pygame.draw.rect(screen, WHITE, buttonRect)
-        screen.blit(buttonText, buttonTextRect)
+        # Redraw everything if the window's contents were lost
+        if event.type in (pygame.WINDOWEXPOSED, pygame.VIDEOEXPOSE):
+            full = True
+        if event.type != pygame.MOUSEBUTTONDOWN:
+            continue
+        mouse = event.pos
 
         # Check if play button clicked
-        click, _, _ = pygame.mouse.get_pressed()
-        if click == 1:
-            mouse = pygame.mouse.get_pos()
-            if buttonRect.collidepoint(mouse):
+        if instructions:
+            if event.button == 1 and playButton.collidepoint(mouse):
                 instructions = False
-                time.sleep(0.3)
-
-        pygame.display.flip()
-        continue
+                full = True
+            continue
 
-    # Draw board
-    cells = []
-    for i in range(HEIGHT):
-        row = []
-        for j in range(WIDTH):
+        move = None
 
-            # Draw rectangle for cell
-            rect = pygame.Rect(
-                board_origin[0] + j * cell_size,
-                board_origin[1] + i * cell_size,
-                cell_size, cell_size
-            )
-            pygame.draw.rect(screen, GRAY, rect)
-            pygame.draw.rect(screen, WHITE, rect, 3)
-
-            # Add a mine, flag, or number if needed
-            if game.is_mine((i, j)) and lost:
-                screen.blit(mine, rect)
-            elif (i, j) in flags:
-                screen.blit(flag, rect)
-            elif (i, j) in revealed:
-                neighbors = smallFont.render(
-                    str(game.nearby_mines((i, j))),
-                    True, BLACK
-                )
-                neighborsTextRect = neighbors.get_rect()
-                neighborsTextRect.center = rect.center
-                screen.blit(neighbors, neighborsTextRect)
-
-            row.append(rect)
-        cells.append(row)
-
-    # AI Move button
-    aiButton = pygame.Rect(
-        (2 / 3) * width + BOARD_PADDING, (1 / 3) * height - 50,
-        (width / 3) - BOARD_PADDING * 2, 50
-    )
-    buttonText = mediumFont.render("AI Move", True, BLACK)
-    buttonRect = buttonText.get_rect()
-    buttonRect.center = aiButton.center
-    pygame.draw.rect(screen, WHITE, aiButton)
-    screen.blit(buttonText, buttonRect)
-
-    # Reset button
-    resetButton = pygame.Rect(
-        (2 / 3) * width + BOARD_PADDING, (1 / 3) * height + 20,
-        (width / 3) - BOARD_PADDING * 2, 50
-    )
-    buttonText = mediumFont.render("Reset", True, BLACK)
-    buttonRect = buttonText.get_rect()
-    buttonRect.center = resetButton.center
-    pygame.draw.rect(screen, WHITE, resetButton)
-    screen.blit(buttonText, buttonRect)
-
-    # Display text
-    text = "Lost" if lost else "Won" if game.mines == flags else ""
-    text = mediumFont.render(text, True, WHITE)
-    textRect = text.get_rect()
-    textRect.center = ((5 / 6) * width, (2 / 3) * height)
-    screen.blit(text, textRect)
-
-    move = None
-
-    left, _, right = pygame.mouse.get_pressed()
-
-    # Check for a right-click to toggle flagging
-    if right == 1 and not lost:
-        mouse = pygame.mouse.get_pos()
-        for i in range(HEIGHT):
-            for j in range(WIDTH):
-                if cells[i][j].collidepoint(mouse) and (i, j) not in revealed:
-                    if (i, j) in flags:
-                        flags.remove((i, j))
-                    else:
-                        flags.add((i, j))
-                    time.sleep(0.2)
+        # Check for a right-click to toggle flagging
+        if event.button == 3 and not lost:
+            cell = cell_at(mouse)
+            if cell is not None and cell not in revealed:
+                if cell in flags:
+                    flags.remove(cell)
+                else:
+                    flags.add(cell)
+                dirty.add(cell)
 
-    elif left == 1:
-        mouse = pygame.mouse.get_pos()
+        elif event.button == 1:
 
-        # If AI button clicked, make an AI move
-        if aiButton.collidepoint(mouse) and not lost:
-            move = ai.make_safe_move()
-            if move is None:
-                move = ai.make_random_move()
+            # If AI button clicked, make an AI move
+            if aiButton.collidepoint(mouse) and not lost:
+                move = ai.make_safe_move()
                 if move is None:
-                    flags = ai.mines.copy()
-                    print("No moves left to make.")
+                    move = ai.make_random_move()
+                    if move is None:
+                        dirty |= flags ^ ai.mines
+                        flags = ai.mines.copy()
+                        print("No moves left to make.")
+                    else:
+                        print("No known safe moves, AI making random move.")
                 else:
-                    print("No known safe moves, AI making random move.")
+                    print("AI making safe move.")
+
+            # Reset game state
+            elif resetButton.collidepoint(mouse):
+                game = Minesweeper(height=HEIGHT, width=WIDTH, mines=MINES)
+                ai = MinesweeperAI(height=HEIGHT, width=WIDTH, mines=MINES)
+                revealed = set()
+                flags = set()
+                lost = False
+                full = True
+
+            # User-made move
+            elif not lost:
+                cell = cell_at(mouse)
+                if (cell is not None
+                        and cell not in flags
+                        and cell not in revealed):
+                    move = cell
+
+        # Make move and update AI knowledge
+        if move:
+            if game.is_mine(move):
+                lost = True
+                dirty |= game.mines
             else:
-                print("AI making safe move.")
-            time.sleep(0.2)
-
-        # Reset game state
-        elif resetButton.collidepoint(mouse):
-            game = Minesweeper(height=HEIGHT, width=WIDTH, mines=MINES)
-            ai = MinesweeperAI(height=HEIGHT, width=WIDTH)
-            revealed = set()
-            flags = set()
-            lost = False
-            continue
+                nearby = game.nearby_mines(move)
+                revealed.add(move)
+                ai.add_knowledge(move, nearby)
+                dirty.add(move)
 
-        # User-made move
-        elif not lost:
-            for i in range(HEIGHT):
-                for j in range(WIDTH):
-                    if (cells[i][j].collidepoint(mouse)
-                            and (i, j) not in flags
-                            and (i, j) not in revealed):
-                        move = (i, j)
-
-    # Make move and update AI knowledge
-    if move:
-        if game.is_mine(move):
-            lost = True
-        else:
-            nearby = game.nearby_mines(move)
-            revealed.add(move)
-            ai.add_knowledge(move, nearby)
-
-    pygame.display.flip()
+    if instructions:
+        if full:
+            draw_instructions()
+            pygame.display.flip()
+            full = False
+        continue
+
+    # Redraw only what changed
+    if full:
+        status = "Lost" if lost else "Won" if game.mines == flags else ""
+        draw_game()
+        pygame.display.flip()
+        full = False
+    elif dirty:
+        rects = [draw_cell(i, j) for i, j in dirty]
+        text = "Lost" if lost else "Won" if game.mines == flags else ""
+        if text != status:
+            status = text
+            rects.append(draw_status())
+        pygame.display.update(rects)
+    dirty.clear()
@@ -0,0 +1,255 @@
+import argparse
+import concurrent.futures
+import csv
+import math
+import os
+import random
+import sys
+import time
+
+from minesweeper import Minesweeper, MinesweeperAI
+
+
+def main():
+
+    # Check for proper usage
+    parser = argparse.ArgumentParser(
+        usage="python simulate.py [--sizes HxW ...] [--densities D ...] "
+              "[--games N] [options]"
+    )
+    parser.add_argument("--sizes", nargs="+",
+                        default=["8x8", "16x16", "16x30"],
+                        help="board sizes, as HEIGHTxWIDTH")
+    parser.add_argument("--densities", type=float, nargs="+",
+                        default=[0.12, 0.16, 0.2],
+                        help="fractions of cells that are mines")
+    parser.add_argument("--games", type=int, default=1000,
+                        help="games to play for each size and density")
+    parser.add_argument("--chunk", type=int, default=100,
+                        help="games played by each task sent to a worker")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--inference", choices=["subset", "linear"],
+                        default="subset")
+    parser.add_argument("--time-budget", type=float, default=0.1,
+                        help="seconds the AI may spend choosing a guess")
+    parser.add_argument("--blind", action="store_true",
+                        help="do not tell the AI how many mines there are")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    configs = []
+    for size in args.sizes:
+        height, width = (int(value) for value in size.lower().split("x"))
+        for density in args.densities:
+            mines = min(max(round(density * height * width), 1),
+                        height * width - 1)
+            configs.append((height, width, mines))
+    options = {
+        "inference": args.inference,
+        "time_budget": args.time_budget,
+        "blind": args.blind,
+        "seed": args.seed
+    }
+
+    writer = csv.writer(sys.stdout)
+    writer.writerow([
+        "height", "width", "mines", "games", "wins", "win_rate", "moves",
+        "moves_per_sec", "mean_inference_ms", "p50_ms", "p90_ms", "p99_ms",
+        "max_ms"
+    ])
+    totals = {config: Result() for config in configs}
+    remaining = {config: math.ceil(args.games / args.chunk)
+                 for config in configs}
+    for config, result in run_tasks(
+        tasks(configs, args.games, args.chunk), options, args.workers
+    ):
+        totals[config].merge(result)
+        remaining[config] -= 1
+
+        # Report each configuration as soon as all its games are done
+        if not remaining[config]:
+            height, width, mines = config
+            writer.writerow([height, width, mines] + totals[config].row())
+            sys.stdout.flush()
+
+
+def tasks(configs, games, chunk):
+    """
+    Yield (config, first, count) for each chunk of games to play.
+    """
+    for config in configs:
+        for first in range(0, games, chunk):
+            yield config, first, min(chunk, games - first)
+
+
+def run_tasks(tasks, options, workers):
+    """
+    Run `play_games` on each task across a pool of `workers` processes,
+    yielding (config, result) as tasks finish.
+
+    At most a few tasks per worker are submitted ahead of the results, so
+    memory stays bounded however many games are played.
+    """
+    if workers <= 1:
+        for task in tasks:
+            yield task[0], play_games(*task, options)
+        return
+
+    limit = workers * 4
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        pending = dict()
+        for task in tasks:
+            pending[executor.submit(play_games, *task, options)] = task[0]
+            if len(pending) >= limit:
+                done, _ = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    yield pending.pop(future), future.result()
+        for future in concurrent.futures.as_completed(pending):
+            yield pending[future], future.result()
+
+
+def play_games(config, first, count, options):
+    """
+    Play games `first` to `first + count` of a configuration and return
+    their Result.
+
+    Each game seeds `random` from the run's seed, its configuration and
+    its number, so a game plays out the same whichever worker plays it.
+    """
+    height, width, mines = config
+    result = Result()
+    for number in range(first, first + count):
+        random.seed(f"{options['seed']}:{height}x{width}:{mines}:{number}")
+        play_game(height, width, mines, options, result)
+    return result
+
+
+def play_game(height, width, mines, options, result):
+    """
+    Play one game, with the AI making every move, and record it in
+    `result`.
+    """
+    began = time.perf_counter()
+    game = Minesweeper(height=height, width=width, mines=mines)
+    ai = MinesweeperAI(
+        height=height, width=width,
+        mines=None if options["blind"] else mines,
+        time_budget=options["time_budget"],
+        inference=options["inference"]
+    )
+    won = False
+    while True:
+        start = time.perf_counter()
+        move = ai.make_safe_move()
+        if move is None:
+            move = ai.make_random_move()
+        if move is None:
+            won = True
+            break
+        if game.is_mine(move):
+            result.latencies.add(time.perf_counter() - start)
+            result.moves += 1
+            break
+        nearby = game.nearby_mines(move)
+        ai.add_knowledge(move, nearby)
+        result.latencies.add(time.perf_counter() - start)
+        result.moves += 1
+    result.seconds += time.perf_counter() - began
+    result.games += 1
+    result.wins += won
+    result.inference_seconds += ai.stats["seconds"]
+    result.inference_calls += ai.stats["calls"]
+
+
+class Result():
+    """
+    Totals for a set of games, which can be merged with other Results.
+    """
+
+    def __init__(self):
+        self.games = 0
+        self.wins = 0
+        self.moves = 0
+        self.seconds = 0
+        self.inference_seconds = 0
+        self.inference_calls = 0
+        self.latencies = Histogram()
+
+    def merge(self, other):
+        self.games += other.games
+        self.wins += other.wins
+        self.moves += other.moves
+        self.seconds += other.seconds
+        self.inference_seconds += other.inference_seconds
+        self.inference_calls += other.inference_calls
+        self.latencies.merge(other.latencies)
+
+    def row(self):
+        """
+        Return the CSV fields after the configuration for these games.
+        """
+        moves_per_sec = self.moves / self.seconds if self.seconds else 0
+        mean_inference = (self.inference_seconds / self.inference_calls
+                          if self.inference_calls else 0)
+        return [
+            self.games, self.wins, f"{self.wins / self.games:.4f}",
+            self.moves, f"{moves_per_sec:.1f}",
+            f"{mean_inference * 1000:.4f}"
+        ] + [
+            f"{self.latencies.percentile(q) * 1000:.4f}"
+            for q in (50, 90, 99, 100)
+        ]
+
+
+class Histogram():
+    """
+    Latency histogram with logarithmic buckets, each an eighth of a
+    doubling wide, so that percentiles of any number of samples can be
+    estimated to within about 9% in constant memory.
+    """
+
+    # Smallest latency the buckets distinguish, in seconds
+    RESOLUTION = 1e-7
+
+    def __init__(self):
+        self.counts = dict()
+        self.largest = 0
+
+    def bucket(self, seconds):
+        if seconds <= self.RESOLUTION:
+            return 0
+        return int(math.log2(seconds / self.RESOLUTION) * 8) + 1
+
+    def add(self, seconds):
+        bucket = self.bucket(seconds)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.largest = max(self.largest, seconds)
+
+    def merge(self, other):
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.largest = max(self.largest, other.largest)
+
+    def percentile(self, q):
+        """
+        Return the upper edge of the bucket holding the `q`th percentile,
+        capped at the largest latency seen.
+        """
+        samples = sum(self.counts.values())
+        if not samples:
+            return 0
+        rank = math.ceil(q / 100 * samples)
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(
+                    self.RESOLUTION * 2 ** (bucket / 8), self.largest
+                )
+        return self.largest
+
+
+if __name__ == "__main__":
+    main()